@@ -61,7 +61,7 @@ def on_load(server: PluginServerInterface, prev_module):
     # 初始化各模块
     api_handler = ApiHandler(server, config)
     event_handler = EventHandler(server, config, api_handler)
-    command_handler = CommandHandler(server, config)
+    command_handler = CommandHandler(server, config, api_handler)
     
     # 注册命令和事件监听器
     command_handler.register_commands()
@@ -100,6 +100,11 @@ def on_unload(server: PluginServerInterface):
         # 强制清理
         _force_cleanup()
     
+    if event_handler is not None:
+        event_handler.shutdown()
+    if api_handler is not None:
+        api_handler.shutdown()
+    
     server.logger.info('QueQiao MCDR 插件已卸载')
 
 def on_info(server: PluginServerInterface, info: Info):
@@ -5,18 +5,34 @@ API处理模块
 """
 
 import json
+import os
 import asyncio
+from concurrent.futures import Future
+from functools import partial
 from typing import Dict, Any, Optional, Callable, Coroutine, List
 
 from mcdreforged.api.all import *
 
+from queqiao_mcdr.command_batcher import CommandBatcher
 from queqiao_mcdr.config import Config
+from queqiao_mcdr.data_api import DataApiClient
+from queqiao_mcdr.event_journal import EventJournal
+from queqiao_mcdr.event_store import EventStore
 from queqiao_mcdr.message_formatter import MessageFormatter
-from queqiao_mcdr.response_builder import ResponseBuilder
+from queqiao_mcdr.player_cache import PlayerStateCache
+from queqiao_mcdr.player_index import PlayerIndex
+from queqiao_mcdr.response_builder import ResponseBuilder, Player, PlayerList
+from queqiao_mcdr.subscription import Subscription
 
 class ApiHandler:
     """API处理器类"""
     
+    # 需要访问发起请求的客户端会话的API
+    SESSION_APIS = frozenset(('batch', 'subscribe'))
+    
+    # get_event_history 单次最多返回的事件数
+    HISTORY_MAX_PAGE_SIZE = 1000
+    
     def __init__(self, server: PluginServerInterface, config: Config):
         """
         初始化API处理器
@@ -29,6 +45,54 @@ class ApiHandler:
         self.logger = server.logger
         self.config = config
         
+        # minecraft_data_api 查询线程池，避免阻塞WebSocket事件循环
+        self.data_api = DataApiClient(server, config.data_api_workers, 'QueQiao-DataApi')
+        
+        # 消息编译结果缓存和大小限制
+        MessageFormatter.configure(
+            config.message_cache_size,
+            config.message_max_depth,
+            config.message_max_nodes,
+            config.message_max_text_length
+        )
+        
+        # 游戏命令批量发送器
+        self.command_batcher = CommandBatcher(server, config.command_batch_window_ms / 1000)
+        
+        # 玩家位置缓存，与事件处理器共享
+        self.player_cache = PlayerStateCache(config.player_cache_ttl)
+        
+        # 在线玩家索引，由事件处理器根据加入/离开事件维护，并在后台定期校准
+        self.player_index = PlayerIndex(self.logger)
+        self.player_index.start_reconcile(
+            self._fetch_server_player_list,
+            config.player_index_reconcile_interval,
+            self._should_reconcile
+        )
+        
+        # 事件日志，WebSocket服务器重启后仍然保留，供客户端重连时补发事件
+        # 事件历史存储由事件日志写入和关闭
+        self.event_journal: Optional[EventJournal] = None
+        self.event_store: Optional[EventStore] = None
+        if config.journal_enabled:
+            if config.history_enabled:
+                try:
+                    self.event_store = EventStore(
+                        os.path.join(server.get_data_folder(), 'history'),
+                        int(config.history_segment_size_mb * 1024 * 1024),
+                        config.history_max_segments,
+                        self.logger
+                    )
+                except OSError as e:
+                    self.logger.error(f'打开事件历史存储失败: {e}')
+            self.event_journal = EventJournal(
+                config.journal_capacity,
+                os.path.join(server.get_data_folder(), 'journal', 'events.jsonl') if config.journal_persist else None,
+                config.journal_segment_max_kb * 1024,
+                self.logger,
+                self.event_store
+            )
+        
         # API方法映射
         self.api_methods = {
             'broadcast': self.broadcast,
@@ -37,45 +101,82 @@ class ApiHandler:
             'send_title': self.send_title,
             'send_actionbar': self.send_actionbar,
             'get_player_list': self.get_player_list,
-            'get_player_info': self.get_player_info
+            'get_player_info': self.get_player_info,
+            'get_event_history': self.get_event_history,
+            'batch': self.batch,
+            'subscribe': self.subscribe
         }
     
-
+    def shutdown(self):
+        """释放API处理器持有的资源"""
+        self.player_index.stop_reconcile()
+        self.data_api.shutdown()
+        self.command_batcher.flush()
+        if self.event_journal is not None:
+            self.event_journal.close()
     
-
+    def _should_reconcile(self) -> bool:
+        """服务器未运行或没有客户端连接时跳过校准，空闲时不向游戏服务器发送命令"""
+        if not self.server.is_server_running():
+            return False
+        from queqiao_mcdr import get_websocket_server
+        ws_server = get_websocket_server()
+        return ws_server is not None and ws_server.has_listeners()
+    
+    def _fetch_server_player_list(self):
+        """通过minecraft_data_api查询服务器玩家列表"""
+        return self._call_minecraft_data_api_safe('get_server_player_list', timeout=5.0)
+    
+    def _get_player_list_from_index(self) -> Dict:
+        """通过在线玩家索引获取玩家列表"""
+        players = [Player(nickname=name, uuid=uuid) for name, uuid in self.player_index.snapshot()]
+        
+        return PlayerList(
+            players=players,
+            count=len(players),
+            max_players=self.player_index.max_players
+        ).to_dict(self.config.omit_null_fields)
     
-    def _get_player_list_via_api(self) -> Dict:
+    async def _get_player_list_via_api(self) -> Dict:
         """通过minecraft_data_api获取玩家列表"""
-        player_list_result = self._call_minecraft_data_api_safe('get_server_player_list', timeout=5.0)
+        player_list_result = await self.data_api.call_async('get_server_player_list', timeout=5.0)
         if not player_list_result:
             raise Exception("API返回空数据")
+        self.player_index.reconcile(player_list_result)
         
         players = []
         for player in player_list_result.players:
             player_name = player.name if hasattr(player, 'name') else str(player)
             player_uuid = str(player.uuid) if hasattr(player, 'uuid') else ''
             
-            players.append(ResponseBuilder.player_data(
-                nickname=player_name,
-                uuid=player_uuid,
-                permission_level=0,
-            ))
-        
-        return ResponseBuilder.player_list_data(
-            players=players, 
-            count=len(players), 
+            players.append(Player(nickname=player_name, uuid=player_uuid))
+        
+        return PlayerList(
+            players=players,
+            count=len(players),
             max_players=getattr(player_list_result, 'limit', None)
-        )
+        ).to_dict(self.config.omit_null_fields)
     
-
-
-    async def handle_api_request(self, api_name: str, api_data: Dict[str, Any], echo: Optional[str] = None) -> Dict[str, Any]:
-        """处理API请求"""
+    
+    
+    async def handle_api_request(self, api_name: str, api_data: Dict[str, Any], echo: Optional[str] = None,
+                                 session=None) -> Dict[str, Any]:
+        """
+        处理API请求
+        
+        Args:
+            api_name: API名称
+            api_data: 请求数据
+            echo: 回显标识
+            session: 发起请求的客户端会话
+        """
         if api_name not in self.api_methods:
             return self._error_response(f'Unknown API: {api_name}', echo)
         
         try:
             method = self.api_methods[api_name]
+            if api_name in self.SESSION_APIS:
+                return await method(api_data, echo, session)
             return await method(api_data, echo)
         except Exception as e:
             self.logger.error(f'处理API请求时出错: {e}')
@@ -91,42 +192,38 @@ class ApiHandler:
         """创建错误响应"""
         return ResponseBuilder.api_error(message=message, echo=echo)
     
-    def _find_player(self, uuid: Optional[str] = None, nickname: Optional[str] = None) -> Optional[str]:
+    async def _find_player(self, uuid: Optional[str] = None, nickname: Optional[str] = None) -> Optional[str]:
         """查找玩家名称"""
         if nickname:
             return nickname
         if not uuid:
             return None
-
+        
+        player_name = self.player_index.find_by_uuid(uuid)
+        if player_name is not None:
+            return player_name
+        
+        # 索引已完整时无需再查询服务器
+        if self.player_index.ready and not self.player_index.has_unknown_uuid():
+            return None
+        
         # 通过 minecraft_data_api 的在线玩家列表从 UUID 反查玩家名
         try:
-            player_list_result = self._call_minecraft_data_api_safe('get_server_player_list', timeout=3.0)
+            player_list_result = await self.data_api.call_async('get_server_player_list', timeout=3.0)
             if not player_list_result or not getattr(player_list_result, 'players', None):
                 return None
-
-            uuid_lower = str(uuid).lower()
-            for player in player_list_result.players:
-                player_uuid = getattr(player, 'uuid', None)
-                if player_uuid is None:
-                    continue
-                if str(player_uuid).lower() == uuid_lower:
-                    player_name = getattr(player, 'name', None)
-                    return str(player_name) if player_name else None
+            self.player_index.reconcile(player_list_result)
+            return self.player_index.find_by_uuid(uuid)
         except Exception:
             return None
-
-        return None
     
     def _format_message_for_command(self, message) -> str:
         """格式化消息用于命令"""
-        formatted = MessageFormatter.format_message(message)
-        if hasattr(formatted, 'to_json_str'):
-            return formatted.to_json_str()
-        return f'{{"text":"{formatted}"}}'
+        return MessageFormatter.format_message_json(message)
     
-    def _get_player_detail_info(self, player_name: str) -> Dict[str, Any]:
+    async def _get_player_detail_info(self, player_name: str) -> Player:
         """获取玩家详细信息"""
-        player_data = ResponseBuilder.player_data(nickname=player_name)
+        player_data = Player(nickname=player_name)
         
         # 获取权限信息
         try:
@@ -134,42 +231,56 @@ class ApiHandler:
             mcdr_server = self.server.get_mcdr_server()
             permission_manager = mcdr_server.permission_manager
             permission_level = permission_manager.get_player_permission_level(player_name)
-            player_data['permission_level'] = permission_level
-            
+            player_data.permission_level = permission_level
+        
         except:
             pass
         
-        # 获取在线状态和位置信息
+        # 获取在线状态和位置信息，玩家UUID未知时查询服务器
+        player_uuid = self.player_index.get_uuid(player_name)
+        if self.player_index.ready and player_uuid != '':
+            if player_uuid is not None:
+                player_data.uuid = player_uuid
+                await self._get_player_location_info(player_name, player_data)
+            return player_data
+        
         try:
-            player_list_result = self._call_minecraft_data_api_safe('get_server_player_list', timeout=3.0)
+            player_list_result = await self.data_api.call_async('get_server_player_list', timeout=3.0)
             if player_list_result:
+                self.player_index.reconcile(player_list_result)
                 for p in player_list_result.players:
                     p_name = p.name if hasattr(p, 'name') else str(p)
                     if p_name == player_name:
-                        player_data['uuid'] = str(p.uuid) if hasattr(p, 'uuid') else ''
-                        self._get_player_location_info(player_name, player_data)
+                        player_data.uuid = str(p.uuid) if hasattr(p, 'uuid') else ''
+                        await self._get_player_location_info(player_name, player_data)
                         break
         except:
             pass
-            
+        
         return player_data
     
-    def _get_player_location_info(self, player_name: str, player_data: Dict):
-        """获取玩家位置信息"""
-        # 获取维度
-        dimension = self._call_minecraft_data_api_safe('get_player_dimension', player_name, timeout=2.0)
-        if dimension is not None:
-            player_data['dimension'] = dimension
-            
-        # 获取坐标
-        coordinate = self._call_minecraft_data_api_safe('get_player_coordinate', player_name, timeout=2.0)
-        if coordinate:
-            player_data['coordinate'] = ResponseBuilder.coordinate_data(
-                x=getattr(coordinate, 'x', None),
-                y=getattr(coordinate, 'y', None),
-                z=getattr(coordinate, 'z', None)
+    async def _get_player_location_info(self, player_name: str, player_data: Player):
+        """获取玩家位置信息（维度和坐标并发查询）"""
+        try:
+            future = self.player_cache.get_location(player_name, self._load_player_location)
+            # 缓存中的查询可能被多个调用方共享，超时时不能取消它
+            dimension, coordinate = await asyncio.wait_for(
+                asyncio.shield(asyncio.wrap_future(future)),
+                timeout=5.0
             )
-
+        except Exception as e:
+            self.logger.debug(f'获取玩家 {player_name} 位置信息失败: {e}')
+            return
+        
+        if dimension is not None:
+            player_data.dimension = dimension
+        if coordinate is not None:
+            player_data.coordinate = coordinate
+    
+    def _load_player_location(self, player_name: str) -> Future:
+        """查询玩家位置信息，供玩家状态缓存调用"""
+        return self.data_api.fetch_location(player_name, timeout=2.0)
+    
     async def broadcast(self, data: Dict[str, Any], echo: Optional[str] = None) -> Dict[str, Any]:
         """广播消息"""
         message = data.get('message')
@@ -195,17 +306,22 @@ class ApiHandler:
             return self._error_response('Missing player identifier (uuid or nickname)', echo)
         
         try:
-            player = self._find_player(uuid, nickname)
+            player = await self._find_player(uuid, nickname)
             if not player:
                 return self._error_response('Player not found', echo)
             
-            formatted_message = MessageFormatter.format_message(message)
-            self.server.tell(player, formatted_message)
+            # 原生Minecraft JSON组件直接通过 tellraw 发送，不经过RText转换
+            native_json = MessageFormatter.format_native_json(message)
+            if native_json is not None and self.server.is_server_running():
+                self.server.execute(f'tellraw {player} {native_json}')
+            else:
+                formatted_message = MessageFormatter.format_message(message)
+                self.server.tell(player, formatted_message)
             
             return self._success_response(
                 'Private message sent',
                 echo,
-                {'player': ResponseBuilder.player_data(nickname=player, uuid=uuid or '')}
+                {'player': Player(nickname=player, uuid=uuid or '').to_dict(self.config.omit_null_fields)}
             )
         except Exception as e:
             return self._error_response(f'Failed to send private message: {str(e)}', echo)
@@ -222,17 +338,17 @@ class ApiHandler:
             stay = data.get('stay', 70)
             fadeout = data.get('fadeout', 20)
             
-            # 设置标题时间
-            self.server.execute(f'title @a times {fadein} {stay} {fadeout}')
+            # 设置标题时间（与上次相同时跳过）
+            self.command_batcher.set_title_times(fadein, stay, fadeout)
             
             # 发送标题
             title_cmd = f'title @a title {self._format_message_for_command(title)}'
-            self.server.execute(title_cmd)
+            self.command_batcher.submit(title_cmd)
             
             # 发送副标题（如果有）
             if subtitle:
                 subtitle_cmd = f'title @a subtitle {self._format_message_for_command(subtitle)}'
-                self.server.execute(subtitle_cmd)
+                self.command_batcher.submit(subtitle_cmd)
             
             return self._success_response('Title displayed', echo)
         except Exception as e:
@@ -246,7 +362,7 @@ class ApiHandler:
         
         try:
             actionbar_cmd = f'title @a actionbar {self._format_message_for_command(message)}'
-            self.server.execute(actionbar_cmd)
+            self.command_batcher.submit(actionbar_cmd)
             return self._success_response('Actionbar message displayed', echo)
         except Exception as e:
             return self._error_response(f'Failed to display actionbar message: {str(e)}', echo)
@@ -254,7 +370,11 @@ class ApiHandler:
     async def get_player_list(self, data: Dict[str, Any], echo: Optional[str] = None) -> Dict[str, Any]:
         """获取在线玩家列表"""
         try:
-            result = self._get_player_list_via_api()
+            # 新加入的玩家在下次校准前UUID未知，此时查询服务器获取完整列表
+            if self.player_index.ready and not self.player_index.has_unknown_uuid():
+                result = self._get_player_list_from_index()
+            else:
+                result = await self._get_player_list_via_api()
             return self._success_response('Player list retrieved', echo, result)
         except Exception as e:
             return self._error_response(f'Failed to get player list: {str(e)}', echo)
@@ -266,19 +386,143 @@ class ApiHandler:
             return self._error_response('Missing player_name parameter', echo)
         
         try:
-            player_data = self._get_player_detail_info(player_name)
+            player_data = await self._get_player_detail_info(player_name)
             return self._success_response(
                 'Player info retrieved',
                 echo,
-                {'player': player_data}
+                {'player': player_data.to_dict(self.config.omit_null_fields)}
             )
         except Exception as e:
             return self._error_response(f'Failed to get player info: {str(e)}', echo)
     
-    def _call_minecraft_data_api_safe(self, method_name: str, *args, **kwargs):
-        """调用minecraft_data_api方法"""
-        minecraft_data_api = self.server.get_plugin_instance('minecraft_data_api')
-        method = getattr(minecraft_data_api, method_name)
-        return method(*args, **kwargs)
+    async def get_event_history(self, data: Any, echo: Optional[str] = None) -> Dict[str, Any]:
+        """按序号、时间、事件名称和玩家分页查询事件历史"""
+        if self.event_store is None:
+            return self._error_response('Event history is not enabled', echo)
+        if data is None:
+            data = {}
+        if not isinstance(data, dict):
+            return self._error_response('Invalid history query', echo)
+        
+        try:
+            query = self._parse_history_query(data)
+        except ValueError as e:
+            return self._error_response(f'Invalid history query: {str(e)}', echo)
+        
+        try:
+            # 读取分段文件可能触发磁盘IO，在线程池中执行避免阻塞事件循环
+            loop = asyncio.get_running_loop()
+            events, has_more = await loop.run_in_executor(None, partial(self.event_store.query, **query))
+        except Exception as e:
+            return self._error_response(f'Failed to get event history: {str(e)}', echo)
+        
+        return self._success_response(
+            'Event history retrieved',
+            echo,
+            {
+                'events': events,
+                'count': len(events),
+                'has_more': has_more,
+                'next_after_seq': events[-1]['seq'] if events else query['after_seq']
+            }
+        )
+    
+    def _parse_history_query(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        解析 get_event_history 的查询条件
+        
+        Args:
+            data: 请求数据
+        
+        Returns:
+            Dict[str, Any]: EventStore.query 的参数
+        
+        Raises:
+            ValueError: 查询条件格式错误
+        """
+        query: Dict[str, Any] = {}
+        for name, default in (('after_seq', 0), ('before_seq', None)):
+            value = data.get(name, default)
+            if value is not None and (isinstance(value, bool) or not isinstance(value, int) or value < 0):
+                raise ValueError(f'{name} must be a non-negative integer')
+            query[name] = value
+        
+        for name in ('since', 'until'):
+            value = data.get(name)
+            if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float))):
+                raise ValueError(f'{name} must be a number')
+            query[name] = value
+        
+        for name, key in (('events', 'event_names'), ('players', 'players')):
+            value = data.get(name)
+            if value is not None:
+                if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+                    raise ValueError(f'{name} must be a list of strings')
+                value = frozenset(item.lower() for item in value) if name == 'players' else frozenset(value)
+            query[key] = value
+        
+        limit = data.get('limit', 100)
+        if isinstance(limit, bool) or not isinstance(limit, int) or not 1 <= limit <= self.HISTORY_MAX_PAGE_SIZE:
+            raise ValueError(f'limit must be an integer between 1 and {self.HISTORY_MAX_PAGE_SIZE}')
+        query['limit'] = limit
+        return query
+    
+    async def batch(self, data: Any, echo: Optional[str] = None, session=None) -> Dict[str, Any]:
+        """批量执行API调用，返回合并的响应"""
+        if isinstance(data, dict):
+            calls = data.get('calls')
+            run_concurrently = bool(data.get('concurrent', False))
+        else:
+            calls = data
+            run_concurrently = False
+        
+        if not isinstance(calls, list) or not calls:
+            return self._error_response('Missing calls parameter', echo)
+        if len(calls) > self.config.batch_max_calls:
+            return self._error_response(f'Too many calls in batch (max {self.config.batch_max_calls})', echo)
+        
+        if run_concurrently:
+            results = await asyncio.gather(*[self._execute_batch_call(call, session) for call in calls])
+        else:
+            results = [await self._execute_batch_call(call, session) for call in calls]
+        
+        failed = sum(1 for result in results if result.get('status') != 'ok')
+        return self._success_response(
+            'Batch executed',
+            echo,
+            {'results': list(results), 'count': len(results), 'failed': failed}
+        )
+    
+    async def _execute_batch_call(self, call: Any, session=None) -> Dict[str, Any]:
+        """执行批量请求中的单个API调用"""
+        if not isinstance(call, dict) or 'api' not in call:
+            return self._error_response('Invalid batch call')
+        
+        echo = call.get('echo')
+        if call['api'] == 'batch':
+            return self._error_response('Nested batch is not allowed', echo)
+        
+        return await self.handle_api_request(call['api'], call.get('data', {}), echo, session)
+    
+    async def subscribe(self, data: Any, echo: Optional[str] = None, session=None) -> Dict[str, Any]:
+        """设置当前连接的事件订阅，未指定的条件不限制"""
+        if session is None:
+            return self._error_response('Subscription requires a WebSocket connection', echo)
+        if data is None:
+            data = {}
+        if not isinstance(data, dict):
+            return self._error_response('Invalid subscription', echo)
+        
+        try:
+            subscription = Subscription.from_api_data(data)
+        except ValueError as e:
+            return self._error_response(f'Invalid subscription: {str(e)}', echo)
+        
+        session.subscribe(subscription)
+        return self._success_response('Subscription updated', echo, {'subscription': subscription.to_dict()})
     
+    def _call_minecraft_data_api_safe(self, method_name: str, *args, **kwargs):
+        """在当前线程中同步调用minecraft_data_api方法，不能在事件循环中使用"""
+        return self.data_api.call(method_name, *args, **kwargs)
+
 
@@ -0,0 +1,176 @@
+"""
+客户端会话模块
+
+为每个WebSocket连接维护有界的发送队列和独立的写任务，
+避免单个慢速客户端拖慢所有广播
+"""
+
+import asyncio
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Set
+
+import websockets
+
+from queqiao_mcdr.codec import Codec
+from queqiao_mcdr.compression import get_compression_stats
+from queqiao_mcdr.config import Config
+from queqiao_mcdr.subscription import Subscription, SubscriptionIndex
+
+# 发送队列溢出策略
+POLICY_DROP_OLDEST = 'drop_oldest'
+POLICY_DROP_NEWEST = 'drop_newest'
+POLICY_DISCONNECT = 'disconnect'
+
+
+class ClientSession:
+    """客户端会话类"""
+    
+    def __init__(self, websocket, config: Config, logger, codec: Codec, subscriptions: SubscriptionIndex):
+        """
+        初始化客户端会话，必须在服务器事件循环中创建
+        
+        Args:
+            websocket: WebSocket连接对象
+            config: 配置对象
+            logger: 日志记录器
+            codec: 握手时协商的消息编码
+            subscriptions: 服务器的事件订阅表
+        """
+        self.websocket = websocket
+        self.logger = logger
+        self.codec = codec
+        self._subscriptions = subscriptions
+        self.client_info = f'{websocket.remote_address[0]}:{websocket.remote_address[1]}'
+        
+        self.max_queue_size = max(1, config.send_queue_size)
+        self.overflow_policy = config.send_queue_policy
+        self.max_overflows = max(1, config.send_queue_max_overflows)
+        
+        self._queue: Deque[Any] = deque()
+        self._wakeup = asyncio.Event()
+        self._writer_task: Optional[asyncio.Task] = None
+        self._closing = False
+        
+        # 并发请求处理
+        self.max_concurrent_requests = max(1, config.max_concurrent_requests)
+        self.request_slots = asyncio.Semaphore(self.max_concurrent_requests)
+        self.request_tasks: Set[asyncio.Task] = set()
+        self.last_response_sent: Optional[asyncio.Future] = None
+        
+        # 统计计数
+        self.sent_frames = 0
+        self.dropped_frames = 0
+        self.overflow_count = 0
+    
+    def start(self):
+        """启动写任务"""
+        if self._writer_task is None:
+            self._writer_task = asyncio.get_running_loop().create_task(self._writer())
+    
+    async def close(self):
+        """停止写任务和未完成的请求，丢弃未发送的数据"""
+        self._closing = True
+        self._subscriptions.remove(self)
+        for task in list(self.request_tasks):
+            task.cancel()
+        if self._writer_task is not None:
+            self._writer_task.cancel()
+            try:
+                await self._writer_task
+            except asyncio.CancelledError:
+                pass
+            self._writer_task = None
+        self._queue.clear()
+    
+    @property
+    def subscription(self) -> Optional[Subscription]:
+        """当前的事件订阅"""
+        return self._subscriptions.get(self)
+    
+    def subscribe(self, subscription: Subscription):
+        """
+        更新事件订阅，只能在服务器事件循环中调用
+        
+        Args:
+            subscription: 新的订阅，替换之前的订阅
+        """
+        if not self._closing:
+            self._subscriptions.update(self, subscription)
+    
+    @property
+    def queued_frames(self) -> int:
+        """当前排队等待发送的帧数"""
+        return len(self._queue)
+    
+    def enqueue(self, frame: Any) -> bool:
+        """
+        将数据帧放入发送队列，只能在服务器事件循环中调用
+        
+        Args:
+            frame: 要发送的数据帧
+        
+        Returns:
+            bool: 数据帧是否已入队
+        """
+        if self._closing:
+            return False
+        
+        if len(self._queue) >= self.max_queue_size:
+            self.overflow_count += 1
+            self.dropped_frames += 1
+            
+            if self.overflow_policy == POLICY_DROP_OLDEST:
+                self._queue.popleft()
+            elif self.overflow_policy == POLICY_DISCONNECT:
+                if self.overflow_count >= self.max_overflows:
+                    self._disconnect_slow_consumer()
+                return False
+            else:
+                return False
+        
+        self._queue.append(frame)
+        self._wakeup.set()
+        return True
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取会话统计信息"""
+        return {
+            'client': self.client_info,
+            'codec': self.codec.name,
+            'sent_frames': self.sent_frames,
+            'dropped_frames': self.dropped_frames,
+            'overflow_count': self.overflow_count,
+            'queued_frames': len(self._queue),
+            'compression': get_compression_stats(self.websocket),
+        }
+    
+    async def _writer(self):
+        """写任务，按顺序发送队列中的数据帧"""
+        while True:
+            while not self._queue:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+            
+            frame = self._queue.popleft()
+            try:
+                # 预编码的字节串直接发送，JSON编码使用文本帧，二进制编码使用二进制帧
+                await self.websocket.send(frame, text=not self.codec.binary)
+                self.sent_frames += 1
+            except websockets.exceptions.ConnectionClosed:
+                self._closing = True
+                self._queue.clear()
+                return
+            except Exception as e:
+                # 编码或websockets版本不兼容等错误会导致事件丢失，需要在日志中可见
+                self.logger.warning(f'向客户端 {self.client_info} 发送数据失败: {e}')
+    
+    def _disconnect_slow_consumer(self):
+        """断开持续溢出的慢速客户端"""
+        self._closing = True
+        self._queue.clear()
+        self.logger.warning(
+            f'客户端 {self.client_info} 发送队列溢出 {self.overflow_count} 次，断开连接'
+        )
+        asyncio.get_running_loop().create_task(
+            self.websocket.close(code=1008, reason='Slow consumer')
+        )
@@ -0,0 +1,95 @@
+"""
+消息编码模块
+
+定义客户端可以在握手时通过 WebSocket 子协议选择的消息编码，
+默认使用JSON文本帧，安装 msgpack 后可选择 MessagePack 二进制帧
+"""
+
+import json
+from typing import Any, Callable, Dict, Optional
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+from queqiao_mcdr.config import Config
+from queqiao_mcdr.utils import json_dumps_bytes
+
+# 子协议名称
+SUBPROTOCOL_JSON = 'json'
+SUBPROTOCOL_MSGPACK = 'msgpack'
+
+
+class Codec:
+    """消息编码类"""
+    
+    def __init__(self, name: str, subprotocol: str, binary: bool,
+                 encode: Callable[[Any], bytes], decode: Callable[[Any], Any]):
+        """
+        初始化消息编码
+        
+        Args:
+            name: 编码名称，用于日志和错误提示
+            subprotocol: 对应的WebSocket子协议
+            binary: 是否使用二进制帧发送
+            encode: 序列化函数，返回字节串
+            decode: 反序列化函数，接收文本或字节串
+        """
+        self.name = name
+        self.subprotocol = subprotocol
+        self.binary = binary
+        self.encode = encode
+        self.decode = decode
+    
+    def __repr__(self) -> str:
+        return f'Codec({self.name})'
+
+
+def _msgpack_decode(data: Any) -> Any:
+    """解析MessagePack数据"""
+    if isinstance(data, str):
+        raise ValueError('MessagePack 消息必须使用二进制帧发送')
+    return msgpack.unpackb(data, raw=False)
+
+
+JSON_CODEC = Codec('JSON', SUBPROTOCOL_JSON, False, json_dumps_bytes, json.loads)
+
+MSGPACK_CODEC = Codec(
+    'MessagePack',
+    SUBPROTOCOL_MSGPACK,
+    True,
+    lambda obj: msgpack.packb(obj, use_bin_type=True),
+    _msgpack_decode
+) if msgpack is not None else None
+
+
+def get_available_codecs(config: Config) -> Dict[str, Codec]:
+    """
+    根据配置获取可协商的编码
+    
+    Args:
+        config: 配置对象
+    
+    Returns:
+        Dict[str, Codec]: 子协议名称到编码的映射，按优先级排列
+    """
+    codecs = {}
+    if config.msgpack_enabled and MSGPACK_CODEC is not None:
+        codecs[SUBPROTOCOL_MSGPACK] = MSGPACK_CODEC
+    codecs[SUBPROTOCOL_JSON] = JSON_CODEC
+    return codecs
+
+
+def select_codec(codecs: Dict[str, Codec], subprotocol: Optional[str]) -> Codec:
+    """
+    获取连接协商得到的编码，未协商子协议时使用JSON
+    
+    Args:
+        codecs: 可用的编码
+        subprotocol: 协商得到的子协议
+    
+    Returns:
+        Codec: 连接使用的编码
+    """
+    return codecs.get(subprotocol, JSON_CODEC) if subprotocol else JSON_CODEC
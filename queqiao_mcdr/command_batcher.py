@@ -0,0 +1,114 @@
+"""
+命令批量发送模块
+
+在短时间窗口内缓冲发往游戏服务器的命令并一次性写入，
+同时去除重复的标题时间设置，减少服务器控制台输入压力
+"""
+
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple
+
+from mcdreforged.api.all import *
+
+class CommandBatcher:
+    """命令批量发送器类"""
+    
+    def __init__(self, server: PluginServerInterface, window: float):
+        """
+        初始化命令批量发送器
+        
+        Args:
+            server: MCDR服务器接口
+            window: 缓冲时间窗口（秒），为0时立即发送
+        """
+        self.server = server
+        self.logger = server.logger
+        self.window = window
+        
+        self._buffer: List[str] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._flush_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._title_times: Optional[Tuple[Any, Any, Any]] = None
+        
+        # 统计计数
+        self.commands_submitted = 0
+        self.commands_deduplicated = 0
+        self.writes = 0
+    
+    def submit(self, command: str):
+        """
+        提交一条命令
+        
+        在事件循环中调用时缓冲到时间窗口结束后统一发送，否则立即发送
+        
+        Args:
+            command: 命令内容
+        """
+        self.commands_submitted += 1
+        
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        
+        if self.window <= 0 or loop is None:
+            self._write([command])
+            return
+        
+        self._buffer.append(command)
+        # 事件循环变化（如WebSocket服务器重启）时旧的定时器不会再触发，需要重新调度
+        if self._flush_handle is None or self._flush_loop is not loop:
+            self._flush_loop = loop
+            self._flush_handle = loop.call_later(self.window, self.flush)
+    
+    def set_title_times(self, fadein: Any, stay: Any, fadeout: Any):
+        """
+        设置标题显示时间，与上次设置相同时跳过
+        
+        Args:
+            fadein: 淡入时间
+            stay: 停留时间
+            fadeout: 淡出时间
+        """
+        times = (fadein, stay, fadeout)
+        if times == self._title_times:
+            self.commands_submitted += 1
+            self.commands_deduplicated += 1
+            return
+        
+        self._title_times = times
+        self.submit(f'title @a times {fadein} {stay} {fadeout}')
+    
+    def invalidate_title_times(self):
+        """使记录的标题时间失效（新玩家加入或服务器重启后需要重新设置）"""
+        self._title_times = None
+    
+    def flush(self):
+        """立即发送所有缓冲的命令"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        self._flush_loop = None
+        
+        if not self._buffer:
+            return
+        
+        commands, self._buffer = self._buffer, []
+        self._write(commands)
+    
+    def get_stats(self) -> Dict[str, int]:
+        """获取统计信息"""
+        return {
+            'submitted': self.commands_submitted,
+            'deduplicated': self.commands_deduplicated,
+            'writes': self.writes,
+            'saved': self.commands_submitted - self.writes,
+        }
+    
+    def _write(self, commands: List[str]):
+        """将命令一次性写入服务器控制台"""
+        self.writes += 1
+        try:
+            self.server.execute('\n'.join(commands))
+        except Exception as e:
+            self.logger.error(f'发送命令失败: {e}')
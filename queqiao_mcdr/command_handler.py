@@ -9,21 +9,24 @@ from typing import Dict, Any, List, Optional
 from mcdreforged.api.all import *
 
 from queqiao_mcdr.config import Config
+from queqiao_mcdr.message_formatter import MessageFormatter
 
 class CommandHandler:
     """命令处理器类"""
     
-    def __init__(self, server: PluginServerInterface, config: Config):
+    def __init__(self, server: PluginServerInterface, config: Config, api_handler=None):
         """
         初始化命令处理器
         
         Args:
             server: MCDR服务器接口
             config: 配置对象
+            api_handler: API处理器
         """
         self.server = server
         self.logger = server.logger
         self.config = config
+        self.api_handler = api_handler
         
         # 命令前缀
         self.prefix = '!!queqiao'
@@ -75,7 +78,7 @@ class CommandHandler:
                 runs(lambda src: self.on_command_debug_status(src)).
                 requires(lambda src: src.has_permission(self.permission['debug']))
             ).
-
+            
             then(
                 Literal('help').
                 runs(lambda src: self.on_command_help(src)).
@@ -143,7 +146,7 @@ class CommandHandler:
             source: 命令源
         """
         # 导入模块
-        from queqiao_mcdr import websocket_server
+        from queqiao_mcdr import websocket_server, event_handler
         
         # 获取WebSocket服务器状态
         is_running = websocket_server is not None and websocket_server.is_running()
@@ -157,6 +160,57 @@ class CommandHandler:
         if is_running:
             source.reply(f'监听地址: {self.config.websocket_host}:{self.config.websocket_port}{self.config.websocket_path}')
             source.reply(f'当前连接数: {client_count}')
+            for stats in websocket_server.get_client_stats():
+                source.reply(
+                    f'  {stats["client"]}: 已发送 {stats["sent_frames"]}，'
+                    f'已丢弃 {stats["dropped_frames"]}，排队中 {stats["queued_frames"]}'
+                )
+                compression = stats['compression']
+                if compression is not None:
+                    source.reply(
+                        f'    压缩: {compression["raw_bytes"]} -> {compression["compressed_bytes"]} 字节'
+                        f'（{compression["ratio"]:.1%}），跳过 {compression["skipped_messages"]} 条短消息'
+                    )
+        
+        if event_handler is not None:
+            source.reply(f'无客户端接收而跳过的事件: {event_handler.skipped_events}')
+            rate_stats = event_handler.rate_limiter.get_stats()
+            source.reply(
+                f'事件限流: 放行 {rate_stats["allowed"]}，丢弃 {rate_stats["dropped"]}'
+                f'（玩家 {rate_stats["dropped_player"]}，全服 {rate_stats["dropped_global"]}）'
+            )
+        if self.api_handler is not None and self.api_handler.event_journal is not None:
+            journal_stats = self.api_handler.event_journal.get_stats()
+            source.reply(
+                f'事件日志: 最后序号 {journal_stats["last_seq"]}，'
+                f'保留 {journal_stats["size"]}/{journal_stats["capacity"]}'
+                f'{"，已持久化" if journal_stats["persistent"] else ""}'
+            )
+        if self.api_handler is not None and self.api_handler.event_store is not None:
+            store_stats = self.api_handler.event_store.get_stats()
+            source.reply(
+                f'事件历史: {store_stats["events"]} 个事件，{store_stats["segments"]} 个分段，'
+                f'最早序号 {store_stats["first_seq"]}'
+            )
+        if is_running:
+            batch_stats = websocket_server.event_batcher.get_stats()
+            source.reply(
+                f'批量事件: {batch_stats["batched"]} 个事件合并为 {batch_stats["frames"]} 个数据帧，'
+                f'合并 {batch_stats["merged"]}'
+            )
+        
+        if self.api_handler is not None:
+            command_stats = self.api_handler.command_batcher.get_stats()
+            source.reply(
+                f'游戏命令: 提交 {command_stats["submitted"]}，写入 {command_stats["writes"]}，'
+                f'去重 {command_stats["deduplicated"]}，节省 {command_stats["saved"]}'
+            )
+        
+        cache_stats = MessageFormatter.cache.get_stats()
+        source.reply(
+            f'消息缓存: {cache_stats["size"]}/{cache_stats["max_size"]}，'
+            f'命中 {cache_stats["hits"]}，未命中 {cache_stats["misses"]}'
+        )
     
     def on_command_debug(self, source: CommandSource, enable: bool):
         """
@@ -0,0 +1,141 @@
+"""
+WebSocket压缩模块
+
+在 permessage-deflate 扩展的基础上增加最小压缩长度阈值和压缩统计，
+较短的消息直接以未压缩形式发送，避免在压缩收益很小的数据上消耗CPU
+"""
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from websockets.extensions.base import Extension
+from websockets.extensions.permessage_deflate import PerMessageDeflate, ServerPerMessageDeflateFactory
+from websockets.frames import CTRL_OPCODES, OP_CONT, Frame
+
+from queqiao_mcdr.config import Config
+
+
+class ThresholdPerMessageDeflate(PerMessageDeflate):
+    """带最小压缩长度阈值的 permessage-deflate 扩展"""
+    
+    def __init__(self, *args, min_size: int = 0, **kwargs):
+        """
+        初始化扩展
+        
+        Args:
+            min_size: 最小压缩长度（字节），短于该长度的单帧消息不压缩
+        """
+        super().__init__(*args, **kwargs)
+        self.min_size = min_size
+        
+        # 统计计数
+        self.raw_bytes = 0
+        self.compressed_bytes = 0
+        self.compressed_messages = 0
+        self.skipped_messages = 0
+    
+    def encode(self, frame: Frame) -> Frame:
+        """
+        编码发送的数据帧
+        
+        Args:
+            frame: 原始数据帧
+        
+        Returns:
+            Frame: 编码后的数据帧，未压缩的消息不设置 rsv1 标志
+        """
+        if frame.opcode in CTRL_OPCODES:
+            return frame
+        
+        # 分片消息的长度在首帧时未知，始终压缩
+        if frame.opcode is not OP_CONT and frame.fin and len(frame.data) < self.min_size:
+            self.skipped_messages += 1
+            self.raw_bytes += len(frame.data)
+            self.compressed_bytes += len(frame.data)
+            return frame
+        
+        encoded = super().encode(frame)
+        if frame.opcode is not OP_CONT:
+            self.compressed_messages += 1
+        self.raw_bytes += len(frame.data)
+        self.compressed_bytes += len(encoded.data)
+        return encoded
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取压缩统计信息"""
+        return {
+            'raw_bytes': self.raw_bytes,
+            'compressed_bytes': self.compressed_bytes,
+            'compressed_messages': self.compressed_messages,
+            'skipped_messages': self.skipped_messages,
+            'ratio': self.compressed_bytes / self.raw_bytes if self.raw_bytes else 1.0,
+        }
+
+
+class ThresholdPerMessageDeflateFactory(ServerPerMessageDeflateFactory):
+    """创建 ThresholdPerMessageDeflate 扩展的服务端工厂"""
+    
+    def __init__(self, min_size: int, **kwargs):
+        """
+        初始化扩展工厂
+        
+        Args:
+            min_size: 最小压缩长度（字节）
+            kwargs: ServerPerMessageDeflateFactory 的协商参数
+        """
+        super().__init__(**kwargs)
+        self.min_size = min_size
+    
+    def process_request_params(self, params: Sequence[Any],
+                               accepted_extensions: Sequence[Extension]) -> Tuple[List[Any], PerMessageDeflate]:
+        """协商扩展参数，返回响应参数和扩展实例"""
+        response_params, extension = super().process_request_params(params, accepted_extensions)
+        return response_params, ThresholdPerMessageDeflate(
+            extension.remote_no_context_takeover,
+            extension.local_no_context_takeover,
+            extension.remote_max_window_bits,
+            extension.local_max_window_bits,
+            extension.compress_settings,
+            min_size=self.min_size
+        )
+
+
+def create_extension_factories(config: Config) -> Optional[List[ThresholdPerMessageDeflateFactory]]:
+    """
+    根据配置创建服务端扩展工厂列表
+    
+    Args:
+        config: 配置对象
+    
+    Returns:
+        Optional[List[ThresholdPerMessageDeflateFactory]]: 扩展工厂列表，未启用压缩时返回None
+    """
+    if not config.compression_enabled:
+        return None
+    
+    compress_settings = {'memLevel': config.compression_memory_level}
+    if config.compression_level is not None:
+        compress_settings['level'] = config.compression_level
+    
+    return [ThresholdPerMessageDeflateFactory(
+        min_size=max(0, config.compression_min_size),
+        server_max_window_bits=config.compression_server_max_window_bits,
+        client_max_window_bits=config.compression_client_max_window_bits,
+        compress_settings=compress_settings
+    )]
+
+
+def get_compression_stats(websocket) -> Optional[Dict[str, Any]]:
+    """
+    获取连接的压缩统计信息
+    
+    Args:
+        websocket: WebSocket连接对象
+    
+    Returns:
+        Optional[Dict[str, Any]]: 压缩统计信息，连接未协商压缩时返回None
+    """
+    protocol = getattr(websocket, 'protocol', None)
+    for extension in getattr(protocol, 'extensions', None) or []:
+        if isinstance(extension, ThresholdPerMessageDeflate):
+            return extension.get_stats()
+    return None
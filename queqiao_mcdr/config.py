@@ -13,19 +13,96 @@ from mcdreforged.api.all import *
 class Config:
     """配置管理类"""
     
+    # 事件位置信息补全模式
+    LOCATION_MODES = ('eager', 'lazy')
+    # 客户端发送队列溢出策略
+    SEND_QUEUE_POLICIES = ('drop_oldest', 'drop_newest', 'disconnect')
+    
     DEFAULT_CONFIG = {
         "websocket": {
             "host": "0.0.0.0",
             "port": 8080,
             "path": "/minecraft/ws",
-            "auto_start": True
+            "auto_start": True,
+            "json_backend": "auto",
+            "msgpack": True,
+            "max_concurrent_requests": 1,
+            "preserve_response_order": True,
+            "send_queue": {
+                "max_size": 1000,
+                "overflow_policy": "drop_oldest",
+                "max_overflows": 100
+            },
+            "compression": {
+                "enabled": True,
+                "min_size": 256,
+                "server_max_window_bits": 12,
+                "client_max_window_bits": 12,
+                "memory_level": 5,
+                "level": 6
+            }
         },
         "server": {
             "name": "MCDR Server",
             "type": "mcdr"
         },
+        "protocol": {
+            "omit_null_fields": False
+        },
         "security": {
             "access_token": ""
+        },
+        "event": {
+            "location_mode": "eager",
+            "enrichment": {
+                "workers": 4,
+                "max_pending": 64
+            },
+            "rate_limit": {
+                "player_rate": 0,
+                "player_burst": 10,
+                "global_rate": 0,
+                "global_burst": 100
+            },
+            "batch": {
+                "window_ms": 20,
+                "max_events": 100
+            },
+            "log_rules": {
+                "defaults": True,
+                "rules": []
+            },
+            "journal": {
+                "enabled": True,
+                "capacity": 1000,
+                "hold_seconds": 60,
+                "persist": False,
+                "segment_max_kb": 1024
+            },
+            "history": {
+                "enabled": False,
+                "segment_size_mb": 4,
+                "max_segments": 16
+            }
+        },
+        "api": {
+            "batch_max_calls": 100,
+            "command_batch_window_ms": 50
+        },
+        "message": {
+            "cache_size": 1024,
+            "max_depth": 32,
+            "max_nodes": 2048,
+            "max_text_length": 32767
+        },
+        "data_api": {
+            "workers": 4
+        },
+        "player_cache": {
+            "ttl": 2.0
+        },
+        "player_index": {
+            "reconcile_interval": 60.0
         }
     }
     
@@ -40,17 +117,64 @@ class Config:
         self.logger = server.logger
         self.config_path = os.path.join(server.get_data_folder(), 'config.json')
         self.config = self.DEFAULT_CONFIG.copy()
+        # 配置版本号，每次应用配置时递增，用于使依赖配置的缓存失效
+        self.revision = 0
         
         # 配置属性
         self.websocket_host = "0.0.0.0"
         self.websocket_port = 8080
         self.websocket_path = "/minecraft/ws"
         self.auto_start = True
+        self.json_backend = "auto"
+        self.msgpack_enabled = True
+        self.max_concurrent_requests = 1
+        self.preserve_response_order = True
+        self.send_queue_size = 1000
+        self.send_queue_policy = "drop_oldest"
+        self.send_queue_max_overflows = 100
+        self.compression_enabled = True
+        self.compression_min_size = 256
+        self.compression_server_max_window_bits = 12
+        self.compression_client_max_window_bits = 12
+        self.compression_memory_level = 5
+        self.compression_level = 6
         
         self.server_name = "MCDR Server"
         self.server_type = "mcdr"
         
         self.access_token = ""
+        
+        self.omit_null_fields = False
+        
+        self.event_location_mode = "eager"
+        self.enrichment_workers = 4
+        self.enrichment_max_pending = 64
+        self.event_player_rate = 0
+        self.event_player_burst = 10
+        self.event_global_rate = 0
+        self.event_global_burst = 100
+        self.event_batch_window_ms = 20
+        self.event_batch_max_events = 100
+        self.log_rules_defaults = True
+        self.log_rules = []
+        self.journal_enabled = True
+        self.journal_capacity = 1000
+        self.journal_hold_seconds = 60
+        self.journal_persist = False
+        self.journal_segment_max_kb = 1024
+        self.history_enabled = False
+        self.history_segment_size_mb = 4
+        self.history_max_segments = 16
+        
+        self.batch_max_calls = 100
+        self.command_batch_window_ms = 50
+        self.message_cache_size = 1024
+        self.message_max_depth = 32
+        self.message_max_nodes = 2048
+        self.message_max_text_length = 32767
+        self.data_api_workers = 4
+        self.player_cache_ttl = 2.0
+        self.player_index_reconcile_interval = 60.0
     
     def load_config(self) -> bool:
         """
@@ -114,12 +238,39 @@ class Config:
     
     def _apply_config(self):
         """应用配置到属性"""
+        self.revision += 1
+        
         # WebSocket配置
         websocket_config = self.config.get('websocket', {})
         self.websocket_host = websocket_config.get('host', "0.0.0.0")
         self.websocket_port = websocket_config.get('port', 8080)
         self.websocket_path = websocket_config.get('path', "/minecraft/ws")
         self.auto_start = websocket_config.get('auto_start', True)
+        self.json_backend = websocket_config.get('json_backend', "auto")
+        self.msgpack_enabled = websocket_config.get('msgpack', True)
+        self.max_concurrent_requests = websocket_config.get('max_concurrent_requests', 1)
+        self.preserve_response_order = websocket_config.get('preserve_response_order', True)
+        
+        send_queue_config = websocket_config.get('send_queue', {})
+        self.send_queue_size = send_queue_config.get('max_size', 1000)
+        self.send_queue_policy = send_queue_config.get('overflow_policy', "drop_oldest")
+        self.send_queue_max_overflows = send_queue_config.get('max_overflows', 100)
+        if self.send_queue_policy not in self.SEND_QUEUE_POLICIES:
+            self.logger.warning(f'未知的发送队列溢出策略: {self.send_queue_policy}，使用 drop_oldest')
+            self.send_queue_policy = "drop_oldest"
+        
+        compression_config = websocket_config.get('compression', {})
+        self.compression_enabled = compression_config.get('enabled', True)
+        self.compression_min_size = compression_config.get('min_size', 256)
+        self.compression_server_max_window_bits = compression_config.get('server_max_window_bits', 12)
+        self.compression_client_max_window_bits = compression_config.get('client_max_window_bits', 12)
+        self.compression_memory_level = compression_config.get('memory_level', 5)
+        self.compression_level = compression_config.get('level', 6)
+        for key in ('server_max_window_bits', 'client_max_window_bits'):
+            value = getattr(self, f'compression_{key}')
+            if not isinstance(value, int) or not 8 <= value <= 15:
+                self.logger.warning(f'压缩配置 {key} 必须在 8 到 15 之间: {value}，使用 12')
+                setattr(self, f'compression_{key}', 12)
         
         # 服务器配置
         server_config = self.config.get('server', {})
@@ -129,6 +280,65 @@ class Config:
         # 安全配置
         security_config = self.config.get('security', {})
         self.access_token = security_config.get('access_token', "")
+        
+        # 协议配置
+        protocol_config = self.config.get('protocol', {})
+        self.omit_null_fields = protocol_config.get('omit_null_fields', False)
+        
+        # 事件配置
+        event_config = self.config.get('event', {})
+        self.event_location_mode = event_config.get('location_mode', "eager")
+        if self.event_location_mode not in self.LOCATION_MODES:
+            self.logger.warning(f'未知的位置信息补全模式: {self.event_location_mode}，使用 eager')
+            self.event_location_mode = "eager"
+        enrichment_config = event_config.get('enrichment', {})
+        self.enrichment_workers = enrichment_config.get('workers', 4)
+        self.enrichment_max_pending = enrichment_config.get('max_pending', 64)
+        rate_limit_config = event_config.get('rate_limit', {})
+        self.event_player_rate = rate_limit_config.get('player_rate', 0)
+        self.event_player_burst = rate_limit_config.get('player_burst', 10)
+        self.event_global_rate = rate_limit_config.get('global_rate', 0)
+        self.event_global_burst = rate_limit_config.get('global_burst', 100)
+        event_batch_config = event_config.get('batch', {})
+        self.event_batch_window_ms = event_batch_config.get('window_ms', 20)
+        self.event_batch_max_events = event_batch_config.get('max_events', 100)
+        log_rules_config = event_config.get('log_rules', {})
+        self.log_rules_defaults = log_rules_config.get('defaults', True)
+        self.log_rules = log_rules_config.get('rules', [])
+        journal_config = event_config.get('journal', {})
+        self.journal_enabled = journal_config.get('enabled', True)
+        self.journal_capacity = journal_config.get('capacity', 1000)
+        self.journal_hold_seconds = journal_config.get('hold_seconds', 60)
+        self.journal_persist = journal_config.get('persist', False)
+        self.journal_segment_max_kb = journal_config.get('segment_max_kb', 1024)
+        history_config = event_config.get('history', {})
+        self.history_enabled = history_config.get('enabled', False)
+        self.history_segment_size_mb = history_config.get('segment_size_mb', 4)
+        self.history_max_segments = history_config.get('max_segments', 16)
+        
+        # API配置
+        api_config = self.config.get('api', {})
+        self.batch_max_calls = api_config.get('batch_max_calls', 100)
+        self.command_batch_window_ms = api_config.get('command_batch_window_ms', 50)
+        
+        # 消息格式配置
+        message_config = self.config.get('message', {})
+        self.message_cache_size = message_config.get('cache_size', 1024)
+        self.message_max_depth = message_config.get('max_depth', 32)
+        self.message_max_nodes = message_config.get('max_nodes', 2048)
+        self.message_max_text_length = message_config.get('max_text_length', 32767)
+        
+        # minecraft_data_api 查询配置
+        data_api_config = self.config.get('data_api', {})
+        self.data_api_workers = data_api_config.get('workers', 4)
+        
+        # 玩家状态缓存配置
+        player_cache_config = self.config.get('player_cache', {})
+        self.player_cache_ttl = player_cache_config.get('ttl', 2.0)
+        
+        # 在线玩家索引配置
+        player_index_config = self.config.get('player_index', {})
+        self.player_index_reconcile_interval = player_index_config.get('reconcile_interval', 60.0)
     
     def _update_dict(self, target: Dict[str, Any], source: Dict[str, Any]):
         """
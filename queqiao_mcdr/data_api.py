@@ -0,0 +1,137 @@
+"""
+数据查询模块
+
+封装对 minecraft_data_api 的阻塞调用，在有界线程池中执行
+"""
+
+import asyncio
+import functools
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Optional, Tuple
+
+from mcdreforged.api.all import *
+
+from queqiao_mcdr.response_builder import Coordinate
+
+class DataApiClient:
+    """minecraft_data_api 调用客户端"""
+    
+    def __init__(self, server: PluginServerInterface, max_workers: int, thread_name_prefix: str):
+        """
+        初始化调用客户端
+        
+        Args:
+            server: MCDR服务器接口
+            max_workers: 线程池最大线程数
+            thread_name_prefix: 线程名前缀
+        """
+        self.server = server
+        self.logger = server.logger
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, max_workers),
+            thread_name_prefix=thread_name_prefix
+        )
+    
+    def call(self, method_name: str, *args, **kwargs) -> Any:
+        """
+        在当前线程中同步调用 minecraft_data_api 方法
+        
+        Args:
+            method_name: 方法名称
+        
+        Returns:
+            Any: 方法返回值
+        """
+        minecraft_data_api = self.server.get_plugin_instance('minecraft_data_api')
+        if minecraft_data_api is None:
+            raise RuntimeError('minecraft_data_api 插件实例获取失败')
+        method = getattr(minecraft_data_api, method_name)
+        return method(*args, **kwargs)
+    
+    def submit(self, method_name: str, *args, **kwargs) -> Future:
+        """
+        在线程池中调用 minecraft_data_api 方法
+        
+        Args:
+            method_name: 方法名称
+        
+        Returns:
+            Future: 调用结果
+        """
+        return self._executor.submit(self.call, method_name, *args, **kwargs)
+    
+    async def call_async(self, method_name: str, *args, **kwargs) -> Any:
+        """
+        在线程池中调用 minecraft_data_api 方法，不阻塞当前事件循环
+        
+        Args:
+            method_name: 方法名称
+        
+        Returns:
+            Any: 方法返回值
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor,
+            functools.partial(self.call, method_name, *args, **kwargs)
+        )
+    
+    def fetch_location(self, player_name: str, timeout: float) -> Future:
+        """
+        并发查询玩家的维度和坐标
+        
+        单项查询失败时对应结果为None，不会影响另一项
+        
+        Args:
+            player_name: 玩家名称
+            timeout: 单项查询超时时间
+        
+        Returns:
+            Future: 结果为 (dimension, coordinate) 元组
+        """
+        result: Future = Future()
+        dimension_future = self.submit('get_player_dimension', player_name, timeout=timeout)
+        coordinate_future = self.submit('get_player_coordinate', player_name, timeout=timeout)
+        
+        pending = [2]
+        lock = threading.Lock()
+        
+        def on_done(_):
+            with lock:
+                pending[0] -= 1
+                if pending[0] > 0:
+                    return
+            if not result.cancelled():
+                result.set_result(self._collect_location(player_name, dimension_future, coordinate_future))
+        
+        dimension_future.add_done_callback(on_done)
+        coordinate_future.add_done_callback(on_done)
+        return result
+    
+    def shutdown(self):
+        """关闭线程池，不等待正在执行的查询"""
+        self._executor.shutdown(wait=False)
+    
+    def _collect_location(self, player_name: str, dimension_future: Future,
+                          coordinate_future: Future) -> Tuple[Optional[Any], Optional[Coordinate]]:
+        """汇总维度和坐标查询结果"""
+        dimension = None
+        try:
+            dimension = dimension_future.result()
+        except Exception as e:
+            self.logger.error(f'获取玩家 {player_name} 维度信息失败: {e}')
+        
+        coordinate_data = None
+        try:
+            coordinate = coordinate_future.result()
+            if coordinate:
+                coordinate_data = Coordinate(
+                    x=getattr(coordinate, 'x', None),
+                    y=getattr(coordinate, 'y', None),
+                    z=getattr(coordinate, 'z', None)
+                )
+        except Exception as e:
+            self.logger.error(f'获取玩家 {player_name} 坐标信息失败: {e}')
+        
+        return dimension, coordinate_data
@@ -0,0 +1,244 @@
+"""
+死亡消息识别模块
+
+根据原版死亡消息翻译表（en_us）生成一个预编译的正则表达式，
+识别服务器日志中的死亡消息并提取死亡玩家、击杀者和使用的物品
+"""
+
+import re
+from typing import Callable, Dict, List, NamedTuple, Optional, Pattern, Tuple
+
+# 原版死亡消息翻译表：翻译键 -> 英文模板，%1$s 为死亡玩家，%2$s 为击杀者，%3$s 为使用的物品
+DEATH_MESSAGES: Dict[str, str] = {
+    'death.attack.anvil': '%1$s was squashed by a falling anvil',
+    'death.attack.anvil.player': '%1$s was squashed by a falling anvil while fighting %2$s',
+    'death.attack.arrow': '%1$s was shot by %2$s',
+    'death.attack.arrow.item': '%1$s was shot by %2$s using %3$s',
+    'death.attack.badRespawnPoint.message': '%1$s was killed by %2$s',
+    'death.attack.cactus': '%1$s was pricked to death',
+    'death.attack.cactus.player': '%1$s walked into a cactus while trying to escape %2$s',
+    'death.attack.cramming': '%1$s was squished too much',
+    'death.attack.cramming.player': '%1$s was squashed by %2$s',
+    'death.attack.dragonBreath': "%1$s was roasted in dragon's breath",
+    'death.attack.dragonBreath.player': "%1$s was roasted in dragon's breath by %2$s",
+    'death.attack.drown': '%1$s drowned',
+    'death.attack.drown.player': '%1$s drowned while trying to escape %2$s',
+    'death.attack.dryout': '%1$s died from dehydration',
+    'death.attack.dryout.player': '%1$s died from dehydration while trying to escape %2$s',
+    'death.attack.even_more_magic': '%1$s was killed by even more magic',
+    'death.attack.explosion': '%1$s blew up',
+    'death.attack.explosion.player': '%1$s was blown up by %2$s',
+    'death.attack.explosion.player.item': '%1$s was blown up by %2$s using %3$s',
+    'death.attack.fall': '%1$s hit the ground too hard',
+    'death.attack.fall.player': '%1$s hit the ground too hard while trying to escape %2$s',
+    'death.attack.fallingBlock': '%1$s was squashed by a falling block',
+    'death.attack.fallingBlock.player': '%1$s was squashed by a falling block while fighting %2$s',
+    'death.attack.fallingStalactite': '%1$s was skewered by a falling stalactite',
+    'death.attack.fallingStalactite.player': '%1$s was skewered by a falling stalactite while fighting %2$s',
+    'death.attack.fireball': '%1$s was fireballed by %2$s',
+    'death.attack.fireball.item': '%1$s was fireballed by %2$s using %3$s',
+    'death.attack.fireworks': '%1$s went off with a bang',
+    'death.attack.fireworks.item': '%1$s went off with a bang due to a firework fired from %3$s by %2$s',
+    'death.attack.fireworks.player': '%1$s went off with a bang while fighting %2$s',
+    'death.attack.flyIntoWall': '%1$s experienced kinetic energy',
+    'death.attack.flyIntoWall.player': '%1$s experienced kinetic energy while trying to escape %2$s',
+    'death.attack.freeze': '%1$s froze to death',
+    'death.attack.freeze.player': '%1$s was frozen to death by %2$s',
+    'death.attack.generic': '%1$s died',
+    'death.attack.generic.player': '%1$s died because of %2$s',
+    'death.attack.genericKill': '%1$s was killed',
+    'death.attack.genericKill.player': '%1$s was killed while fighting %2$s',
+    'death.attack.hotFloor': '%1$s discovered the floor was lava',
+    'death.attack.hotFloor.player': '%1$s walked into the danger zone due to %2$s',
+    'death.attack.inFire': '%1$s went up in flames',
+    'death.attack.inFire.player': '%1$s walked into fire while fighting %2$s',
+    'death.attack.inWall': '%1$s suffocated in a wall',
+    'death.attack.inWall.player': '%1$s suffocated in a wall while fighting %2$s',
+    'death.attack.indirectMagic': '%1$s was killed by %2$s using magic',
+    'death.attack.indirectMagic.item': '%1$s was killed by %2$s using %3$s',
+    'death.attack.lava': '%1$s tried to swim in lava',
+    'death.attack.lava.player': '%1$s tried to swim in lava to escape %2$s',
+    'death.attack.lightningBolt': '%1$s was struck by lightning',
+    'death.attack.lightningBolt.player': '%1$s was struck by lightning while fighting %2$s',
+    'death.attack.mace_smash': '%1$s was smashed by %2$s',
+    'death.attack.mace_smash.item': '%1$s was smashed by %2$s with %3$s',
+    'death.attack.magic': '%1$s was killed by magic',
+    'death.attack.magic.player': '%1$s was killed by magic while trying to escape %2$s',
+    'death.attack.mob': '%1$s was slain by %2$s',
+    'death.attack.mob.item': '%1$s was slain by %2$s using %3$s',
+    'death.attack.onFire': '%1$s burned to death',
+    'death.attack.onFire.item': '%1$s was burned to a crisp while fighting %2$s wielding %3$s',
+    'death.attack.onFire.player': '%1$s was burned to a crisp while fighting %2$s',
+    'death.attack.outOfWorld': '%1$s fell out of the world',
+    'death.attack.outOfWorld.player': "%1$s didn't want to live in the same world as %2$s",
+    'death.attack.outsideBorder': '%1$s left the confines of this world',
+    'death.attack.outsideBorder.player': '%1$s left the confines of this world while fighting %2$s',
+    'death.attack.player': '%1$s was slain by %2$s',
+    'death.attack.player.item': '%1$s was slain by %2$s using %3$s',
+    'death.attack.sonic_boom': '%1$s was obliterated by a sonically-charged shriek',
+    'death.attack.sonic_boom.item':
+        '%1$s was obliterated by a sonically-charged shriek while trying to escape %2$s wielding %3$s',
+    'death.attack.sonic_boom.player': '%1$s was obliterated by a sonically-charged shriek while trying to escape %2$s',
+    'death.attack.spit': '%1$s was spit by %2$s',
+    'death.attack.spit.item': '%1$s was spit by %2$s using %3$s',
+    'death.attack.stalagmite': '%1$s was impaled on a stalagmite',
+    'death.attack.stalagmite.player': '%1$s was impaled on a stalagmite while fighting %2$s',
+    'death.attack.starve': '%1$s starved to death',
+    'death.attack.starve.player': '%1$s starved to death while fighting %2$s',
+    'death.attack.sting': '%1$s was stung to death',
+    'death.attack.sting.item': '%1$s was stung to death by %2$s using %3$s',
+    'death.attack.sting.player': '%1$s was stung to death by %2$s',
+    'death.attack.sweetBerryBush': '%1$s was poked to death by a sweet berry bush',
+    'death.attack.sweetBerryBush.player':
+        '%1$s was poked to death by a sweet berry bush while trying to escape %2$s',
+    'death.attack.thorns': '%1$s was killed while trying to hurt %2$s',
+    'death.attack.thorns.item': '%1$s was killed by %3$s while trying to hurt %2$s',
+    'death.attack.thrown': '%1$s was pummeled by %2$s',
+    'death.attack.thrown.item': '%1$s was pummeled by %2$s using %3$s',
+    'death.attack.trident': '%1$s was impaled by %2$s',
+    'death.attack.trident.item': '%1$s was impaled by %2$s with %3$s',
+    'death.attack.wither': '%1$s withered away',
+    'death.attack.wither.player': '%1$s withered away while fighting %2$s',
+    'death.attack.witherSkull': '%1$s was shot by a skull from %2$s',
+    'death.attack.witherSkull.item': '%1$s was shot by a skull from %2$s using %3$s',
+    'death.fell.accident.generic': '%1$s fell from a high place',
+    'death.fell.accident.ladder': '%1$s fell off a ladder',
+    'death.fell.accident.other_climbable': '%1$s fell while climbing',
+    'death.fell.accident.scaffolding': '%1$s fell off scaffolding',
+    'death.fell.accident.twisting_vines': '%1$s fell off some twisting vines',
+    'death.fell.accident.vines': '%1$s fell off some vines',
+    'death.fell.accident.weeping_vines': '%1$s fell off some weeping vines',
+    'death.fell.assist': '%1$s was doomed to fall by %2$s',
+    'death.fell.assist.item': '%1$s was doomed to fall by %2$s using %3$s',
+    'death.fell.finish': '%1$s fell too far and was finished by %2$s',
+    'death.fell.finish.item': '%1$s fell too far and was finished by %2$s using %3$s',
+    'death.fell.killer': '%1$s was doomed to fall',
+}
+
+# 模板相同、只能根据击杀者是否为玩家区分的翻译键：生物击杀 -> 玩家击杀
+PLAYER_KILL_KEYS: Dict[str, str] = {
+    'death.attack.mob': 'death.attack.player',
+    'death.attack.mob.item': 'death.attack.player.item',
+}
+
+# 模板占位符及其编号对应的结果字段
+_PLACEHOLDER = re.compile(r'%([123])\$s')
+_GROUP_NAMES = {'2': 'killer', '3': 'item'}
+
+
+class DeathMessage(NamedTuple):
+    """死亡消息识别结果"""
+    key: str
+    victim: str
+    killer: Optional[str]
+    item: Optional[str]
+
+
+class DeathMessageMatcher:
+    """死亡消息识别器类"""
+    
+    def __init__(self, messages: Dict[str, str] = DEATH_MESSAGES):
+        """
+        编译死亡消息翻译表
+        
+        模板按死亡玩家之后的第一个单词分组，每组编译为一个正则表达式，
+        识别时先按该单词查表，绝大部分日志在查表时即被排除；
+        与之前的模板完全相同的模板不会被编译（见 PLAYER_KILL_KEYS）
+        
+        Args:
+            messages: 翻译键到模板的映射，模板必须以 "%1$s " 开头
+        
+        Raises:
+            ValueError: 模板格式不受支持
+        """
+        grouped: Dict[str, List[Tuple[int, str]]] = {}
+        # 分支名称 -> (翻译键, 占位符名称到捕获组名称的映射)
+        self._branches: Dict[str, Tuple[str, Dict[str, str]]] = {}
+        seen_templates = set()
+        
+        for index, (key, template) in enumerate(messages.items()):
+            if not template.startswith('%1$s ') or '%1$s' in template[4:]:
+                raise ValueError(f'死亡消息模板必须以死亡玩家开头: {key}')
+            if template in seen_templates:
+                continue
+            seen_templates.add(template)
+            template = template[5:]
+            
+            # 每个分支使用独立的组名，匹配后由 lastgroup 确定命中的模板
+            branch = f'm{index}'
+            groups = {}
+            parts = []
+            position = 0
+            for placeholder in _PLACEHOLDER.finditer(template):
+                name = _GROUP_NAMES[placeholder.group(1)]
+                group = groups[name] = f'{name[0]}{index}'
+                parts.append(re.escape(template[position:placeholder.start()]))
+                parts.append(f'(?P<{group}>.+?)')
+                position = placeholder.end()
+            parts.append(re.escape(template[position:]))
+            
+            self._branches[branch] = (key, groups)
+            # 字面文本较长的模板优先匹配，避免被更短的模板以非贪婪捕获误匹配
+            literal_length = len(_PLACEHOLDER.sub('', template))
+            grouped.setdefault(template.split(' ', 1)[0], []).append(
+                (literal_length, f'(?P<{branch}>{"".join(parts)})')
+            )
+        
+        # 死亡玩家之后的第一个单词 -> 以该单词开头的模板
+        self._patterns: Dict[str, Pattern] = {}
+        for word, branches in grouped.items():
+            branches.sort(key=lambda item: -item[0])
+            self._patterns[word] = re.compile('|'.join(pattern for _, pattern in branches))
+    
+    def might_match(self, message: str) -> bool:
+        """
+        快速检查消息是否可能为死亡消息，只检查第二个单词
+        
+        Args:
+            message: 日志内容
+        
+        Returns:
+            bool: 是否需要进一步匹配
+        """
+        return self._get_pattern(message)[0] is not None
+    
+    def match(self, message: str, is_player: Optional[Callable[[str], bool]] = None) -> Optional[DeathMessage]:
+        """
+        识别死亡消息
+        
+        Args:
+            message: 日志内容
+            is_player: 检查击杀者是否为玩家的函数，用于区分 PLAYER_KILL_KEYS 中模板相同的翻译键，
+                为None时总是使用生物击杀的翻译键
+        
+        Returns:
+            Optional[DeathMessage]: 识别结果，不是死亡消息时返回None
+        """
+        pattern, start = self._get_pattern(message)
+        if pattern is None:
+            return None
+        
+        result = pattern.fullmatch(message, start)
+        if result is None:
+            return None
+        
+        key, groups = self._branches[result.lastgroup]
+        killer = groups.get('killer')
+        item = groups.get('item')
+        killer = result.group(killer) if killer is not None else None
+        if key in PLAYER_KILL_KEYS and killer is not None and is_player is not None and is_player(killer):
+            key = PLAYER_KILL_KEYS[key]
+        return DeathMessage(
+            key,
+            message[:start - 1],
+            killer,
+            result.group(item) if item is not None else None
+        )
+    
+    def _get_pattern(self, message: str) -> Tuple[Optional[Pattern], int]:
+        """根据第二个单词获取需要匹配的正则表达式和第二个单词的起始位置"""
+        start = message.find(' ') + 1
+        if start <= 1:
+            return None, 0
+        end = message.find(' ', start)
+        return self._patterns.get(message[start:end] if end >= 0 else message[start:]), start
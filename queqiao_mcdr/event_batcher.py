@@ -0,0 +1,107 @@
+"""
+事件批量发送模块
+
+在短时间窗口内缓冲发往已开启批量接收的客户端的事件，
+合并为一个多事件数据帧发送，减少突发事件时的序列化和发送次数
+"""
+
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple
+
+from queqiao_mcdr.codec import Codec
+
+
+class EventBatcher:
+    """事件批量发送器类，只能在服务器事件循环中使用"""
+    
+    def __init__(self, window: float, max_events: int, logger):
+        """
+        初始化事件批量发送器
+        
+        Args:
+            window: 缓冲时间窗口（秒）
+            max_events: 单个数据帧最多包含的事件数，达到后立即发送
+            logger: 日志记录器
+        """
+        self.window = window
+        self.max_events = max(1, max_events)
+        self.logger = logger
+        
+        self._events: List[Dict[str, Any]] = []
+        # 客户端会话 -> 需要接收的事件下标
+        self._recipients: Dict[Any, List[int]] = {}
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        
+        # 统计计数
+        self.batched_events = 0
+        self.frames = 0
+        self.merged_events = 0
+    
+    def add(self, event_data: Dict[str, Any], sessions: List[Any]):
+        """
+        缓冲一个事件
+        
+        Args:
+            event_data: 已序列化为字典的事件数据
+            sessions: 需要接收该事件的客户端会话
+        """
+        index = len(self._events)
+        self._events.append(event_data)
+        full = False
+        for session in sessions:
+            indexes = self._recipients.setdefault(session, [])
+            indexes.append(index)
+            full = full or len(indexes) >= self.max_events
+        
+        if full:
+            self.flush()
+        elif self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(self.window, self.flush)
+    
+    def flush(self):
+        """立即发送所有缓冲的事件"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        
+        if not self._events:
+            return
+        
+        events, self._events = self._events, []
+        recipients, self._recipients = self._recipients, {}
+        
+        # 编码和接收的事件都相同的客户端共享同一个已编码的数据帧
+        frames: Dict[Tuple[Codec, Tuple[int, ...]], Any] = {}
+        for session, indexes in recipients.items():
+            key = (session.codec, tuple(indexes))
+            frame = frames.get(key)
+            if frame is None:
+                try:
+                    frame = frames[key] = session.codec.encode({
+                        'post_type': 'batch',
+                        'events': [events[index] for index in indexes],
+                    })
+                except Exception as e:
+                    self.logger.error(f'序列化批量事件失败: {e}')
+                    continue
+            if not session.enqueue(frame):
+                continue
+            self.batched_events += len(indexes)
+            self.frames += 1
+            self.merged_events += len(indexes) - 1
+    
+    def clear(self):
+        """丢弃所有缓冲的事件"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        self._events = []
+        self._recipients = {}
+    
+    def get_stats(self) -> Dict[str, int]:
+        """获取统计信息"""
+        return {
+            'batched': self.batched_events,
+            'frames': self.frames,
+            'merged': self.merged_events,
+        }
@@ -4,16 +4,17 @@
 负责监听MCDR事件并转换为QueQiao格式
 """
 
-import json
 import threading
-from typing import Dict, Any, Optional, List
-import asyncio
+from typing import Dict, Any, Optional
 
 from mcdreforged.api.all import *
 
 from queqiao_mcdr.config import Config
-from queqiao_mcdr.message_formatter import MessageFormatter
-from queqiao_mcdr.response_builder import ResponseBuilder
+from queqiao_mcdr.data_api import DataApiClient
+from queqiao_mcdr.death_messages import DeathMessage, DeathMessageMatcher
+from queqiao_mcdr.log_rules import LogRuleMatch, load_log_rules
+from queqiao_mcdr.rate_limiter import EventRateLimiter
+from queqiao_mcdr.response_builder import EVENT_NAME_MAP, ResponseBuilder, DeathInfo, Event, Player
 
 class EventHandler:
     """事件处理器类"""
@@ -31,6 +32,39 @@ class EventHandler:
         self.logger = server.logger
         self.config = config
         self.api_handler = api_handler
+        
+        # 位置信息补全线程池：每次补全并发执行维度和坐标两项查询
+        self.enrichment_client = DataApiClient(
+            server,
+            config.enrichment_workers * 2,
+            'QueQiao-Enrich'
+        )
+        # 限制同时进行中的补全数量，超出时直接发送不含位置信息的事件
+        self._enrichment_slots = threading.BoundedSemaphore(max(1, config.enrichment_max_pending))
+        
+        # 事件信封模板（服务器名称、类型、版本），服务器启动或配置重载后重新生成
+        self._envelope: Optional[Dict[str, Any]] = None
+        self._envelope_revision = -1
+        
+        # 根据原版死亡消息翻译表编译的死亡消息识别器
+        self.death_matcher = DeathMessageMatcher()
+        # 进度、服务器启动和停止等日志的识别规则
+        self.log_rules = load_log_rules(config.log_rules, config.log_rules_defaults, self.logger)
+        
+        # 没有客户端接收而跳过的事件数
+        self.skipped_events = 0
+        
+        # 聊天、命令和死亡事件的速率限制，超出时丢弃事件
+        self.rate_limiter = EventRateLimiter(
+            config.event_player_rate,
+            config.event_player_burst,
+            config.event_global_rate,
+            config.event_global_burst
+        )
+    
+    def shutdown(self):
+        """释放事件处理器持有的资源"""
+        self.enrichment_client.shutdown()
     
     def register_events(self):
         """注册MCDR事件监听器"""
@@ -38,6 +72,8 @@ class EventHandler:
         self.server.register_event_listener(MCDRPluginEvents.PLAYER_LEFT, self.on_player_left)
         self.server.register_event_listener(MCDRPluginEvents.USER_INFO, self.on_user_info)
         self.server.register_event_listener(MCDRPluginEvents.GENERAL_INFO, self.on_server_info)
+        self.server.register_event_listener(MCDRPluginEvents.SERVER_STARTUP, self.on_server_startup)
+        self.server.register_event_listener(MCDRPluginEvents.SERVER_STOP, self.on_server_stop)
     
     def on_player_joined(self, server: PluginServerInterface, player: str, info: Info):
         """
@@ -49,22 +85,21 @@ class EventHandler:
             info: 信息对象
         """
         try:
+            # 新加入的玩家使用默认标题时间，下次发送标题时需要重新设置
+            self.api_handler.command_batcher.invalidate_title_times()
+            
+            # 更新在线玩家索引，UUID由后台定期校准获取
+            self.api_handler.player_index.add(player)
+            if not self.has_listeners('join'):
+                return
+            
             # 创建BaseJoinEvent
             event_data = self.create_base_event('notice', 'join')
             
-            # 获取玩家对象
-            player_obj = None
-            try:
-                minecraft_data_api = server.get_plugin_instance('minecraft_data_api')
-                if minecraft_data_api is not None:
-                    player_obj = minecraft_data_api.get_player_info(player)
-            except:
-                pass  # minecraft_data_api插件不存在或方法不存在
-            
-            player_data = self.create_player_data(player, player_obj)
+            player_data = self.create_player_data(player)
             
             # 添加玩家信息
-            event_data['player'] = player_data
+            event_data.player = player_data
             
             # 异步获取位置信息后再发送完整事件
             self._send_event_with_location(event_data, player)
@@ -83,15 +118,23 @@ class EventHandler:
             server: MCDR服务器接口
             player: 玩家名称
         """
+        # 玩家离开后位置缓存和在线索引不再有效
+        self.api_handler.player_cache.invalidate(player)
+        self.api_handler.player_index.remove(player)
+        self.rate_limiter.remove(player)
+        
         try:
+            if not self.has_listeners('quit'):
+                return
+            
             # 创建BaseQuitEvent
             event_data = self.create_base_event('notice', 'quit')
             
             # 创建玩家数据（玩家已离开，可能无法获取完整信息）
-            player_data = ResponseBuilder.player_data(nickname=player)
+            player_data = Player(nickname=player)
             
             # 添加玩家信息
-            event_data['player'] = player_data
+            event_data.player = player_data
             
             # 广播事件
             self.broadcast_event(event_data)
@@ -117,31 +160,18 @@ class EventHandler:
             
             # 判断是否为命令
             is_command = info.content.startswith('/')
+            sub_type = 'player_command' if is_command else 'chat'
+            if not self.has_listeners(sub_type) or not self.rate_limiter.try_acquire(info.player):
+                return
             
-            # 创建事件数据
-            if is_command:
-                # 创建BasePlayerCommandEvent
-                event_data = self.create_base_event('message', 'player_command')
-                sub_type = 'player_command'
-            else:
-                # 创建BaseChatEvent
-                event_data = self.create_base_event('message', 'chat')
-                sub_type = 'chat'
+            # 创建BasePlayerCommandEvent或BaseChatEvent
+            event_data = self.create_base_event('message', sub_type)
             
-            # 获取玩家对象
-            player_obj = None
-            try:
-                minecraft_data_api = server.get_plugin_instance('minecraft_data_api')
-                if minecraft_data_api is not None:
-                    player_obj = minecraft_data_api.get_player_info(info.player)
-            except:
-                pass  # minecraft_data_api插件不存在或方法不存在
-            
-            player_data = self.create_player_data(info.player, player_obj)
+            player_data = self.create_player_data(info.player)
             
             # 添加玩家信息和消息内容
-            event_data['player'] = player_data
-            event_data['message'] = info.content
+            event_data.player = player_data
+            event_data.message = info.content
             
             # 异步获取位置信息后再发送完整事件
             self._send_event_with_location(event_data, info.player)
@@ -161,58 +191,130 @@ class EventHandler:
             info: 信息对象
         """
         try:
-            # 检查是否为死亡消息
-            if self.is_death_message(info.content):
-                # 解析死亡消息
-                player_name = self.extract_player_from_death_message(info.content)
-                if player_name:
-                    # 创建BaseDeathEvent
-                    event_data = self.create_base_event('message', 'death')
-                    
-                    # 获取玩家对象
-                    player_obj = None
-                    try:
-                        minecraft_data_api = server.get_plugin_instance('minecraft_data_api')
-                        if minecraft_data_api is not None:
-                            player_obj = minecraft_data_api.get_player_info(player_name)
-                    except:
-                        pass  # minecraft_data_api插件不存在或方法不存在
-                    
-                    player_data = self.create_player_data(player_name, player_obj)
-                    
-                    # 添加玩家信息和死亡消息
-                    event_data['player'] = player_data
-                    event_data['message'] = info.content
-                    
-                    # 异步获取位置信息后再发送完整事件
-                    self._send_event_with_location(event_data, player_name)
-                    
-                    self.logger.debug(f'玩家死亡事件: {player_name} - {info.content}')
+            # 玩家发送的消息由 on_user_info 处理，不能当作服务器日志
+            if info.is_user or not self.has_clients():
+                return
+            
+            # 按日志规则识别进度、服务器启动和停止等日志
+            rule_match = self.log_rules.match(info.content)
+            if rule_match is not None:
+                self._send_log_rule_event(rule_match, info.content)
+                return
+            
+            # 识别并解析死亡消息
+            # 击杀者为在线玩家时使用 death.attack.player 等翻译键
+            death = self.death_matcher.match(info.content, self.api_handler.player_index.is_online)
+            if death is not None and self.has_listeners('death') and self.rate_limiter.try_acquire(death.victim):
+                player_name = death.victim
+                
+                # 创建BaseDeathEvent
+                event_data = self.create_base_event('message', 'death')
+                
+                player_data = self.create_player_data(player_name)
+                
+                # 添加玩家信息、死亡消息和击杀者
+                event_data.player = player_data
+                event_data.message = info.content
+                event_data.death = DeathInfo(death.key, death.killer, death.item)
+                
+                # 异步获取位置信息后再发送完整事件
+                self._send_event_with_location(event_data, player_name)
+                
+                self.logger.debug(f'玩家死亡事件: {player_name} - {info.content}')
         except Exception as e:
             self.logger.error(f'处理服务器消息事件时出错: {e}')
             import traceback
             self.logger.error(traceback.format_exc())
     
-    def create_base_event(self, post_type: str, sub_type: Optional[str] = None) -> Dict[str, Any]:
+    def on_server_startup(self, server: PluginServerInterface):
+        """
+        处理服务器启动完成事件
+        
+        Args:
+            server: MCDR服务器接口
+        """
+        # 服务器版本可能在重启后发生变化
+        self.invalidate_envelope()
+    
+    def on_server_stop(self, server: PluginServerInterface, return_code: int):
+        """
+        处理服务器停止事件
+        
+        Args:
+            server: MCDR服务器接口
+            return_code: 服务器进程返回码
+        """
+        # 服务器停止后所有玩家均已离线
+        self.api_handler.player_index.clear()
+        self.api_handler.player_cache.clear()
+        self.api_handler.command_batcher.invalidate_title_times()
+        self.rate_limiter.clear()
+        self.invalidate_envelope()
+    
+    def has_clients(self) -> bool:
+        """检查是否有已连接的客户端"""
+        from queqiao_mcdr import get_websocket_server
+        ws_server = get_websocket_server()
+        return ws_server is not None and ws_server.has_listeners()
+    
+    def has_listeners(self, sub_type: str, event_name: Optional[str] = None) -> bool:
+        """
+        检查是否有客户端接收该类型的事件，没有时计入跳过的事件数
+        
+        Args:
+            sub_type: 事件子类型
+            event_name: 事件名称，为None时根据子类型确定
+        
+        Returns:
+            bool: 是否需要创建并发送事件
+        """
+        from queqiao_mcdr import get_websocket_server
+        ws_server = get_websocket_server()
+        if ws_server is not None and ws_server.has_listeners(event_name or EVENT_NAME_MAP.get(sub_type)):
+            return True
+        self.skipped_events += 1
+        return False
+    
+    def create_base_event(self, post_type: str, sub_type: Optional[str] = None) -> Event:
         """创建基础事件结构"""
-        return ResponseBuilder.base_event(
-            server_name=self.config.server_name,
-            server_version=self.get_server_version(),
-            server_type=self.config.server_type,
-            post_type=post_type,
-            sub_type=sub_type
-        )
+        return ResponseBuilder.event_from_envelope(self.get_envelope(), post_type, sub_type)
+    
+    def get_envelope(self) -> Dict[str, Any]:
+        """
+        获取事件信封模板，不存在或配置已重载时重新生成
+        
+        Returns:
+            Dict[str, Any]: 事件信封模板
+        """
+        envelope = self._envelope
+        if envelope is None or self._envelope_revision != self.config.revision:
+            self._envelope_revision = self.config.revision
+            envelope = ResponseBuilder.event_envelope(
+                server_name=self.config.server_name,
+                server_version=self.get_server_version(),
+                server_type=self.config.server_type
+            )
+            self._envelope = envelope
+        return envelope
     
-    def create_player_data(self, player_name: str, player_obj: Optional[Any] = None) -> Dict[str, Any]:
-        """创建玩家数据"""
-        uuid = ''
-        # 获取UUID（只从玩家对象获取，不自动生成）
-        if player_obj and hasattr(player_obj, 'uuid'):
-            uuid = str(player_obj.uuid)
-        elif player_obj and hasattr(player_obj, 'UUID'):
-            uuid = str(player_obj.UUID)
+    def invalidate_envelope(self):
+        """使事件信封模板失效，下次创建事件时重新获取服务器信息"""
+        self._envelope = None
+    
+    def create_player_data(self, player_name: str) -> Player:
+        """
+        创建玩家数据
+        
+        UUID只从在线玩家索引获取（由后台校准补全），不为每个事件查询 minecraft_data_api
         
-        return ResponseBuilder.player_data(nickname=player_name, uuid=uuid, is_op=None)
+        Args:
+            player_name: 玩家名称
+        
+        Returns:
+            Player: 玩家数据，UUID未知时为空字符串
+        """
+        uuid = self.api_handler.player_index.get_uuid(player_name)
+        return Player(nickname=player_name, uuid=uuid or '', is_op=None)
     
     def get_server_version(self) -> str:
         """获取服务器版本"""
@@ -222,75 +324,115 @@ class EventHandler:
     
     def is_death_message(self, message: str) -> bool:
         """检查是否为死亡消息"""
-        death_keywords = [
-            "was slain", "was shot", "was killed", "drowned", "blew up", 
-            "hit the ground", "fell from", "burned to death", "tried to swim in lava",
-            "fell out of the world", "withered away", "suffocated"
-        ]
-        
-        return any(keyword in message for keyword in death_keywords)
+        return self.death_matcher.match(message) is not None
     
     def extract_player_from_death_message(self, message: str) -> Optional[str]:
-        """从死亡消息中提取玩家名称"""
-        parts = message.split(' ')
-        return parts[0] if len(parts) > 1 else None
+        """从死亡消息中提取死亡玩家名称"""
+        death: Optional[DeathMessage] = self.death_matcher.match(message)
+        return death.victim if death is not None else None
     
-    def broadcast_event(self, event_data: Dict[str, Any]):
-        """广播事件"""
-        def async_runner():
-            try:
-                from queqiao_mcdr import get_websocket_server
-                ws_server = get_websocket_server()
-                if ws_server and ws_server.is_running():
-                    loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(loop)
-                    try:
-                        loop.run_until_complete(ws_server.broadcast_event(event_data))
-                    finally:
-                        loop.close()
-            except:
-                pass
+    def broadcast_event(self, event_data: Event):
+        """广播事件（投递到WebSocket服务器的事件循环中执行）"""
+        try:
+            from queqiao_mcdr import get_websocket_server
+            ws_server = get_websocket_server()
+            if ws_server and ws_server.is_running():
+                if not ws_server.dispatch_event(event_data):
+                    self.logger.debug('WebSocket服务器事件循环不可用，事件已丢弃')
+        except Exception as e:
+            self.logger.debug(f'投递事件失败: {e}')
+    
+    def _send_log_rule_event(self, rule_match: LogRuleMatch, content: str):
+        """
+        发送日志规则识别出的事件
         
-        import threading
-        threading.Thread(target=async_runner, daemon=True).start()
+        Args:
+            rule_match: 日志规则匹配结果
+            content: 日志内容，规则没有 message 组时作为事件消息
+        """
+        rule = rule_match.rule
+        if not self.has_listeners(rule.sub_type, rule.event_name):
+            return
+        # 服务器启动、停止等没有玩家的事件不限流，避免在刷屏时被丢弃
+        if rule_match.player is not None and not self.rate_limiter.try_acquire(rule_match.player):
+            return
+        
+        event_data = self.create_base_event(rule.post_type, rule.sub_type)
+        if rule.event_name is not None:
+            event_data.event_name = rule.event_name
+        if rule_match.player is not None:
+            event_data.player = self.create_player_data(rule_match.player)
+        event_data.message = rule_match.message if rule_match.message is not None else content
+        
+        self.broadcast_event(event_data)
+        self.logger.debug(f'日志规则 {rule.name} 事件: {content}')
     
-    def _send_event_with_location(self, event_data: Dict[str, Any], player_name: str):
-        """发送包含位置信息的完整事件"""
-        def send_complete_event():
-            try:
-                minecraft_data_api = self.server.get_plugin_instance('minecraft_data_api')
-                if minecraft_data_api:
-                    # 获取维度
-                    try:
-                        dimension = minecraft_data_api.get_player_dimension(player_name, timeout=1.5)
-                        if dimension is not None:
-                            event_data['player']['dimension'] = dimension
-                    except Exception as e:
-                        self.logger.error(f'获取玩家 {player_name} 维度信息失败: {e}')
-                    
-                    # 获取坐标
-                    try:
-                        coordinate = minecraft_data_api.get_player_coordinate(player_name, timeout=1.5)
-                        if coordinate:
-                            event_data['player']['coordinate'] = ResponseBuilder.coordinate_data(
-                                x=getattr(coordinate, 'x', None),
-                                y=getattr(coordinate, 'y', None),
-                                z=getattr(coordinate, 'z', None)
-                            )
-                    except Exception as e:
-                        self.logger.error(f'获取玩家 {player_name} 坐标信息失败: {e}')
-                else:
-                    self.logger.warning('minecraft_data_api 插件实例获取失败')
-                
+    def _send_event_with_location(self, event_data: Event, player_name: str):
+        """
+        补全位置信息后发送事件
+        
+        没有客户端需要位置信息时直接发送；lazy 模式下先发送基础事件，
+        再以 PlayerLocationUpdateEvent 单独发送位置信息；补全线程池饱和时直接发送
+        
+        Args:
+            event_data: 事件数据
+            player_name: 玩家名称
+        """
+        from queqiao_mcdr import get_websocket_server
+        ws_server = get_websocket_server()
+        if ws_server is None or not ws_server.wants_location():
+            self.broadcast_event(event_data)
+            return
+        
+        lazy = self.config.event_location_mode == 'lazy'
+        if lazy:
+            self.broadcast_event(event_data)
+        
+        if not self._enrichment_slots.acquire(blocking=False):
+            self.logger.debug(f'位置信息补全队列已满，跳过位置信息: {player_name}')
+            if not lazy:
+                self.broadcast_event(event_data)
+            return
+        
+        try:
+            future = self.api_handler.player_cache.get_location(
+                player_name,
+                lambda name: self.enrichment_client.fetch_location(name, timeout=1.5)
+            )
+        except Exception as e:
+            self._enrichment_slots.release()
+            self.logger.error(f'提交位置信息查询失败: {e}')
+            if not lazy:
                 self.broadcast_event(event_data)
+            return
+        
+        def on_location(location_future):
+            dimension = coordinate = None
+            try:
+                dimension, coordinate = location_future.result()
             except Exception as e:
-                self.logger.error(f'发送事件时出错: {e}')
-                import traceback
-                self.logger.error(traceback.format_exc())
+                self.logger.error(f'获取玩家 {player_name} 位置信息失败: {e}')
+            finally:
+                self._enrichment_slots.release()
+            
+            if not lazy:
+                if dimension is not None:
+                    event_data.player.dimension = dimension
+                if coordinate is not None:
+                    event_data.player.coordinate = coordinate
                 self.broadcast_event(event_data)
+                return
+            
+            if dimension is None and coordinate is None:
+                return
+            # 基础事件可能仍在发送中，使用新的玩家对象而不修改已发送的事件
+            update_event = self.create_base_event('notice', 'location_update')
+            update_event.player = Player(
+                nickname=event_data.player.nickname,
+                uuid=event_data.player.uuid,
+                dimension=dimension,
+                coordinate=coordinate
+            )
+            self.broadcast_event(update_event)
         
-        # 在新线程中异步执行
-        import threading
-        threading.Thread(target=send_complete_event, daemon=True).start()
-
-
+        future.add_done_callback(on_location)
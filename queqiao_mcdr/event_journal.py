@@ -0,0 +1,226 @@
+"""
+事件日志模块
+
+为每个广播的事件分配单调递增的序号，并在内存环形缓冲区中保留最近的事件，
+可选地追加写入数据文件夹中的分段文件，客户端重连时可以据此补发断线期间错过的事件
+"""
+
+import json
+import os
+import queue
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+from urllib.parse import parse_qs, urlsplit
+
+from queqiao_mcdr.event_store import EventStore
+from queqiao_mcdr.utils import json_dumps_bytes
+
+
+class EventJournal:
+    """事件日志类"""
+    
+    def __init__(self, capacity: int, segment_path: Optional[str], segment_max_bytes: int, logger,
+                 store: Optional[EventStore] = None):
+        """
+        初始化事件日志，启用分段文件时从文件恢复最近的事件和序号
+        
+        Args:
+            capacity: 内存中保留的事件数
+            segment_path: 分段文件路径，为None时只保存在内存中
+            segment_max_bytes: 单个分段文件的最大字节数，超出后轮换为 <segment_path>.1
+            logger: 日志记录器
+            store: 事件历史存储，为None时只保留最近的事件
+        """
+        self.capacity = max(1, capacity)
+        self.segment_path = segment_path
+        self.segment_max_bytes = max(1024, segment_max_bytes)
+        self.logger = logger
+        self.store = store
+        
+        self._events: Deque[Dict[str, Any]] = deque(maxlen=self.capacity)
+        self._last_seq = 0
+        self._lock = threading.Lock()
+        
+        self._segment = None
+        self._segment_size = 0
+        # 分段文件和历史存储由写入线程追加，文件IO不在WebSocket事件循环中执行
+        self._write_queue: 'queue.Queue[Optional[Dict[str, Any]]]' = queue.Queue()
+        self._writer_thread: Optional[threading.Thread] = None
+        if segment_path is not None:
+            self._open_segment()
+        if self._segment is not None or store is not None:
+            self._writer_thread = threading.Thread(
+                target=self._writer_loop,
+                daemon=True,
+                name='QueQiao-Journal'
+            )
+            self._writer_thread.start()
+        # 序号从历史存储中最后的事件继续，早于内存缓冲区的事件从历史存储中读取
+        if store is not None and store.last_seq > self._last_seq:
+            self._last_seq = store.last_seq
+    
+    @property
+    def last_seq(self) -> int:
+        """最后一个事件的序号，没有事件时为0"""
+        return self._last_seq
+    
+    def append(self, event_data: Dict[str, Any]) -> int:
+        """
+        记录一个事件，事件中会写入 seq 字段，分段文件和历史存储由写入线程异步追加
+        
+        Args:
+            event_data: 已序列化为字典的事件数据
+        
+        Returns:
+            int: 事件序号
+        """
+        with self._lock:
+            self._last_seq += 1
+            event_data['seq'] = self._last_seq
+            self._events.append(event_data)
+            if self._writer_thread is not None:
+                self._write_queue.put(event_data)
+            return self._last_seq
+    
+    def since(self, last_seq: int, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        获取序号大于 last_seq 的事件
+        
+        last_seq 大于最后一个事件的序号时（如插件重载后未启用分段文件，序号重新开始），返回保留的全部事件；
+        早于内存缓冲区的事件从历史存储中读取
+        
+        Args:
+            last_seq: 客户端收到的最后一个事件的序号
+            limit: 最多返回的事件数，超出时只返回最新的事件
+        
+        Returns:
+            List[Dict[str, Any]]: 按序号排列的事件
+        """
+        with self._lock:
+            if last_seq > self._last_seq:
+                last_seq = 0
+            if limit is not None:
+                last_seq = max(last_seq, self._last_seq - limit)
+            # 需要的事件总在缓冲区末尾，从后向前查找
+            events = []
+            for event_data in reversed(self._events):
+                if event_data['seq'] <= last_seq:
+                    break
+                events.append(event_data)
+            events.reverse()
+            oldest = events[0]['seq'] if events else self._last_seq + 1
+        
+        if self.store is not None and oldest - 1 > last_seq:
+            older, _ = self.store.query(after_seq=last_seq, before_seq=oldest, limit=oldest - 1 - last_seq)
+            events = older + events
+        return events
+    
+    def close(self):
+        """等待写入线程写完已记录的事件，关闭分段文件和历史存储"""
+        if self._writer_thread is not None:
+            self._write_queue.put(None)
+            self._writer_thread.join(timeout=5)
+            self._writer_thread = None
+        with self._lock:
+            if self._segment is not None:
+                try:
+                    self._segment.close()
+                except OSError as e:
+                    self.logger.error(f'关闭事件日志文件失败: {e}')
+                self._segment = None
+            if self.store is not None:
+                self.store.close()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取统计信息"""
+        return {
+            'last_seq': self._last_seq,
+            'size': len(self._events),
+            'capacity': self.capacity,
+            'persistent': self._segment is not None,
+        }
+    
+    def _open_segment(self):
+        """恢复已有的分段文件并打开当前分段用于追加写入"""
+        try:
+            folder = os.path.dirname(self.segment_path)
+            if folder and not os.path.exists(folder):
+                os.makedirs(folder)
+            for path in (self.segment_path + '.1', self.segment_path):
+                self._load_segment(path)
+            self._segment = open(self.segment_path, 'ab')
+            self._segment_size = self._segment.tell()
+            if self._last_seq:
+                self.logger.info(f'已从事件日志恢复 {len(self._events)} 个事件，最后序号 {self._last_seq}')
+        except OSError as e:
+            self.logger.error(f'打开事件日志文件失败，仅在内存中保存事件: {e}')
+            self._segment = None
+    
+    def _load_segment(self, path: str):
+        """读取分段文件中的事件，跳过损坏的行（如写入中断的最后一行）"""
+        if not os.path.exists(path):
+            return
+        with open(path, 'rb') as f:
+            for line in f:
+                try:
+                    event_data = json.loads(line)
+                    seq = event_data['seq']
+                except (ValueError, KeyError, TypeError):
+                    continue
+                if isinstance(seq, int) and seq > self._last_seq:
+                    self._last_seq = seq
+                    self._events.append(event_data)
+    
+    def _writer_loop(self):
+        """写入线程，依次追加队列中的事件，队列暂时为空时刷新文件"""
+        while True:
+            event_data = self._write_queue.get()
+            if event_data is None:
+                break
+            if self.store is not None:
+                self.store.append(event_data)
+            if self._segment is None:
+                continue
+            self._write_segment(event_data)
+            if self._write_queue.empty() and self._segment is not None:
+                try:
+                    self._segment.flush()
+                except OSError as e:
+                    self.logger.error(f'写入事件日志文件失败，仅在内存中保存事件: {e}')
+                    self._segment = None
+    
+    def _write_segment(self, event_data: Dict[str, Any]):
+        """追加写入分段文件，超出大小后轮换（在写入线程中调用）"""
+        try:
+            line = json_dumps_bytes(event_data) + b'\n'
+            self._segment.write(line)
+            self._segment_size += len(line)
+            if self._segment_size >= self.segment_max_bytes:
+                self._segment.close()
+                os.replace(self.segment_path, self.segment_path + '.1')
+                self._segment = open(self.segment_path, 'ab')
+                self._segment_size = 0
+        except OSError as e:
+            self.logger.error(f'写入事件日志文件失败，仅在内存中保存事件: {e}')
+            self._segment = None
+
+
+def parse_last_seq(path: str) -> Optional[int]:
+    """
+    从握手请求路径的查询参数中获取 last_seq
+    
+    Args:
+        path: 请求路径，可以包含查询字符串
+    
+    Returns:
+        Optional[int]: 客户端收到的最后一个事件的序号，未指定或格式错误时返回None
+    """
+    values = parse_qs(urlsplit(path).query).get('last_seq')
+    if not values:
+        return None
+    try:
+        last_seq = int(values[-1])
+    except ValueError:
+        return None
+    return last_seq if last_seq >= 0 else None
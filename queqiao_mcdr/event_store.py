@@ -0,0 +1,275 @@
+"""
+事件历史存储模块
+
+将事件追加写入数据文件夹中固定大小的内存映射分段文件，
+并在内存中按序号和时间建立偏移索引，查询时只读取需要的记录所在的页
+"""
+
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+from queqiao_mcdr.utils import json_dumps_bytes
+
+# 记录头: 事件数据长度, 序号, 时间戳, 事件名称长度, 玩家名称长度
+# 记录头之后依次为事件名称、玩家名称（小写）和JSON格式的事件数据，事件数据长度为0表示分段结束
+_HEADER = struct.Struct('<IQdHH')
+
+# 分段文件名: events-<首个事件的序号>.seg
+_SEGMENT_PREFIX = 'events-'
+_SEGMENT_SUFFIX = '.seg'
+
+
+class _Segment:
+    """内存映射的分段文件及其索引"""
+    
+    __slots__ = ('path', 'file', 'map', 'size', 'position', 'seqs', 'times', 'offsets', 'event_names', 'players')
+    
+    def __init__(self, path: str, size: int):
+        """
+        打开分段文件，文件不存在时按固定大小创建
+        
+        Args:
+            path: 分段文件路径
+            size: 新建分段文件的大小（字节）
+        """
+        self.path = path
+        exists = os.path.exists(path)
+        self.file = open(path, 'r+b' if exists else 'w+b')
+        if not exists:
+            self.file.truncate(size)
+        self.size = os.path.getsize(path)
+        self.map = mmap.mmap(self.file.fileno(), self.size)
+        self.position = 0
+        
+        # 索引，按记录顺序排列
+        self.seqs = array('Q')
+        self.times = array('d')
+        self.offsets = array('L')
+        self.event_names: List[str] = []
+        self.players: List[str] = []
+        
+        if exists:
+            self._scan()
+    
+    def _scan(self):
+        """扫描记录头重建索引，遇到未写完的记录时停止"""
+        names: Dict[bytes, str] = {}
+        last_seq = 0
+        while self.position + _HEADER.size <= self.size:
+            length, seq, timestamp, name_length, player_length = _HEADER.unpack_from(self.map, self.position)
+            end = self.position + _HEADER.size + name_length + player_length + length
+            if length == 0 or seq <= last_seq or end > self.size:
+                break
+            start = self.position + _HEADER.size
+            name = self.map[start:start + name_length]
+            player = self.map[start + name_length:start + name_length + player_length]
+            self._index(seq, timestamp, self.position,
+                        names.setdefault(name, name.decode('utf-8', 'replace')),
+                        names.setdefault(player, player.decode('utf-8', 'replace')))
+            last_seq = seq
+            self.position = end
+    
+    def _index(self, seq: int, timestamp: float, offset: int, event_name: str, player: str):
+        """将记录加入索引"""
+        self.seqs.append(seq)
+        self.times.append(timestamp)
+        self.offsets.append(offset)
+        self.event_names.append(event_name)
+        self.players.append(player)
+    
+    def append(self, seq: int, timestamp: float, event_name: str, player: str, payload: bytes) -> bool:
+        """
+        追加一条记录，先写入记录内容再写入记录头，中断时不会留下不完整的记录
+        
+        Returns:
+            bool: 分段剩余空间是否足够
+        """
+        name_bytes = event_name.encode('utf-8')
+        player_bytes = player.encode('utf-8')
+        start = self.position + _HEADER.size
+        end = start + len(name_bytes) + len(player_bytes) + len(payload)
+        if end > self.size:
+            return False
+        self.map[start:end] = name_bytes + player_bytes + payload
+        _HEADER.pack_into(self.map, self.position, len(payload), seq, timestamp, len(name_bytes), len(player_bytes))
+        self._index(seq, timestamp, self.position, event_name, player)
+        self.position = end
+        return True
+    
+    def read(self, index: int) -> Dict[str, Any]:
+        """读取指定下标的记录中的事件数据"""
+        offset = self.offsets[index]
+        length, _, _, name_length, player_length = _HEADER.unpack_from(self.map, offset)
+        start = offset + _HEADER.size + name_length + player_length
+        return json.loads(self.map[start:start + length])
+    
+    def close(self, remove: bool = False):
+        """关闭分段文件"""
+        self.map.flush()
+        self.map.close()
+        self.file.close()
+        if remove:
+            os.remove(self.path)
+
+
+class EventStore:
+    """事件历史存储类"""
+    
+    def __init__(self, folder: str, segment_size: int, max_segments: int, logger):
+        """
+        初始化事件历史存储，加载已有的分段文件
+        
+        Args:
+            folder: 分段文件所在的文件夹
+            segment_size: 单个分段文件的大小（字节）
+            max_segments: 保留的分段文件数，超出时删除最早的分段
+            logger: 日志记录器
+        """
+        self.folder = folder
+        self.segment_size = max(64 * 1024, segment_size)
+        self.max_segments = max(1, max_segments)
+        self.logger = logger
+        
+        self._segments: List[_Segment] = []
+        self._last_seq = 0
+        self._last_time = 0.0
+        self._lock = threading.Lock()
+        
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+        for name in sorted(os.listdir(folder)):
+            if name.startswith(_SEGMENT_PREFIX) and name.endswith(_SEGMENT_SUFFIX):
+                try:
+                    segment = _Segment(os.path.join(folder, name), self.segment_size)
+                except (OSError, ValueError) as e:
+                    self.logger.error(f'加载事件历史分段 {name} 失败: {e}')
+                    continue
+                if segment.seqs and segment.seqs[0] > self._last_seq:
+                    self._segments.append(segment)
+                    self._last_seq = segment.seqs[-1]
+                    self._last_time = segment.times[-1]
+                else:
+                    segment.close(remove=not segment.seqs)
+    
+    @property
+    def last_seq(self) -> int:
+        """最后一个事件的序号，没有事件时为0"""
+        return self._last_seq
+    
+    def append(self, event_data: Dict[str, Any]):
+        """
+        追加一个事件，事件中必须已包含 seq 字段
+        
+        Args:
+            event_data: 已序列化为字典的事件数据
+        """
+        seq = event_data['seq']
+        player = event_data.get('player')
+        player_name = player.get('nickname') if isinstance(player, dict) else None
+        payload = json_dumps_bytes(event_data)
+        event_name = event_data.get('event_name') or ''
+        player_key = player_name.lower() if player_name else ''
+        record_size = _HEADER.size + len(event_name.encode('utf-8')) + len(player_key.encode('utf-8')) + len(payload)
+        if record_size > self.segment_size:
+            self.logger.warning(f'事件 {seq} 大于分段文件大小，未写入事件历史')
+            return
+        
+        with self._lock:
+            if seq <= self._last_seq:
+                return
+            # 时间戳保持单调，以便按时间二分查找
+            timestamp = max(time.time(), self._last_time)
+            try:
+                segment = self._segments[-1] if self._segments else None
+                if segment is None or not segment.append(seq, timestamp, event_name, player_key, payload):
+                    self._new_segment(seq).append(seq, timestamp, event_name, player_key, payload)
+            except (OSError, ValueError) as e:
+                self.logger.error(f'写入事件历史失败: {e}')
+                return
+            self._last_seq = seq
+            self._last_time = timestamp
+    
+    def query(self, after_seq: int = 0, before_seq: Optional[int] = None, since: Optional[float] = None,
+              until: Optional[float] = None, event_names: Optional[FrozenSet[str]] = None,
+              players: Optional[FrozenSet[str]] = None, limit: int = 100) -> Tuple[List[Dict[str, Any]], bool]:
+        """
+        按序号顺序查询事件
+        
+        Args:
+            after_seq: 只返回序号大于该值的事件
+            before_seq: 只返回序号小于该值的事件
+            since: 只返回该时间（Unix时间戳，秒）及之后的事件
+            until: 只返回该时间之前的事件
+            event_names: 事件名称，为None时不限制
+            players: 玩家名称（小写），为None时不限制
+            limit: 最多返回的事件数
+        
+        Returns:
+            Tuple[List[Dict[str, Any]], bool]: 事件列表，以及是否还有更多符合条件的事件
+        """
+        events: List[Dict[str, Any]] = []
+        with self._lock:
+            for segment in self._segments:
+                if not segment.seqs:
+                    continue
+                if segment.seqs[-1] <= after_seq or (since is not None and segment.times[-1] < since):
+                    continue
+                if (before_seq is not None and segment.seqs[0] >= before_seq) or \
+                        (until is not None and segment.times[0] >= until):
+                    break
+                
+                # 在索引中二分查找范围，只读取符合条件的记录
+                start = bisect_right(segment.seqs, after_seq)
+                end = len(segment.seqs)
+                if before_seq is not None:
+                    end = bisect_left(segment.seqs, before_seq, start)
+                if since is not None:
+                    start = max(start, bisect_left(segment.times, since, start, end))
+                if until is not None:
+                    end = bisect_left(segment.times, until, start, end)
+                
+                for index in range(start, end):
+                    if event_names is not None and segment.event_names[index] not in event_names:
+                        continue
+                    if players is not None and segment.players[index] not in players:
+                        continue
+                    if len(events) >= limit:
+                        return events, True
+                    events.append(segment.read(index))
+        return events, False
+    
+    def close(self):
+        """关闭所有分段文件"""
+        with self._lock:
+            for segment in self._segments:
+                try:
+                    segment.close()
+                except (OSError, ValueError) as e:
+                    self.logger.error(f'关闭事件历史分段失败: {e}')
+            self._segments = []
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取统计信息"""
+        with self._lock:
+            return {
+                'last_seq': self._last_seq,
+                'segments': len(self._segments),
+                'events': sum(len(segment.seqs) for segment in self._segments),
+                'first_seq': next((segment.seqs[0] for segment in self._segments if segment.seqs), None),
+            }
+    
+    def _new_segment(self, first_seq: int) -> _Segment:
+        """创建新的分段文件，超出保留数量时删除最早的分段"""
+        while len(self._segments) >= self.max_segments:
+            self._segments.pop(0).close(remove=True)
+        path = os.path.join(self.folder, f'{_SEGMENT_PREFIX}{first_seq:020d}{_SEGMENT_SUFFIX}')
+        segment = _Segment(path, self.segment_size)
+        self._segments.append(segment)
+        return segment
@@ -0,0 +1,233 @@
+"""
+日志规则模块
+
+将服务器日志识别规则（进度、服务器启动和停止、白名单拒绝等）合并编译为一个正则表达式，
+每行日志只需匹配一次即可确定命中的规则并提取玩家名称等字段
+"""
+
+import re
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+# 内置规则，可通过配置中同名的规则覆盖
+DEFAULT_LOG_RULES: List[Dict[str, Any]] = [
+    {
+        'name': 'advancement',
+        'pattern': r'(?P<player>\S+) has (?:made the advancement|completed the challenge|reached the goal) '
+                   r'\[(?P<message>.+)\]',
+        'post_type': 'notice',
+        'sub_type': 'achievent',
+    },
+    {
+        'name': 'server_start',
+        'pattern': r'Done \((?P<message>[\d.]+s)\)! For help, type "help".*',
+        'post_type': 'notice',
+        'sub_type': 'server_start',
+    },
+    {
+        'name': 'server_stop',
+        'pattern': r'Stopping (?:the )?server',
+        'post_type': 'notice',
+        'sub_type': 'server_stop',
+    },
+    {
+        'name': 'whitelist_kick',
+        'pattern': r'(?P<player>\S+) \(/[^)]*\) lost connection: (?P<message>You are not white-listed on this server!)',
+        'post_type': 'notice',
+        'sub_type': 'whitelist_kick',
+    },
+    {
+        'name': 'whitelist_kick_legacy',
+        'pattern': r'Disconnecting .*?name=(?P<player>[^,\]]+).*?: '
+                   r'(?P<message>You are not white-listed on this server!)',
+        'post_type': 'notice',
+        'sub_type': 'whitelist_kick',
+    },
+]
+
+# 规则中的命名组、反向引用和条件引用
+_GROUP_DEFINITION = re.compile(r'\(\?P<([A-Za-z_]\w*)>')
+_GROUP_REFERENCE = re.compile(r'\(\?(P=|\()([A-Za-z_]\w*)\)')
+# 合并后无法使用的写法：按编号引用组（合并后编号改变）和全局标志（合并后不在开头）
+_NUMBERED_REFERENCE = re.compile(r'(?<!\\)(?:\\\\)*(?:\\[1-9]|\(\?\(\d+\))')
+_GLOBAL_FLAGS = re.compile(r'(?<!\\)(?:\\\\)*\(\?[aiLmsux]+\)')
+
+
+def _wrap_pattern(index: int, pattern: str) -> Tuple[str, str, Dict[str, str]]:
+    """
+    将规则包装为合并后的分支，规则内的命名组加上规则序号前缀避免重名
+    
+    Args:
+        index: 规则序号
+        pattern: 规则的正则表达式
+    
+    Returns:
+        Tuple[str, str, Dict[str, str]]: 分支名称、分支正则表达式、原组名到合并后组名的映射
+    """
+    prefix = f'r{index}_'
+    groups = {name: prefix + name for name in _GROUP_DEFINITION.findall(pattern)}
+    pattern = _GROUP_DEFINITION.sub(lambda m: f'(?P<{prefix}{m.group(1)}>', pattern)
+    pattern = _GROUP_REFERENCE.sub(lambda m: f'(?{m.group(1)}{prefix}{m.group(2)})', pattern)
+    branch = f'r{index}'
+    return branch, f'(?P<{branch}>{pattern})', groups
+
+
+class LogRule:
+    """日志规则类"""
+    
+    __slots__ = ('name', 'pattern', 'post_type', 'sub_type', 'event_name')
+    
+    def __init__(self, name: str, pattern: str, post_type: str, sub_type: str, event_name: Optional[str] = None):
+        """
+        初始化日志规则
+        
+        Args:
+            name: 规则名称
+            pattern: 匹配整行日志的正则表达式，命名组 player 为玩家名称，message 为事件消息
+            post_type: 事件类型
+            sub_type: 事件子类型
+            event_name: 事件名称，为None时根据子类型确定
+        """
+        self.name = name
+        self.pattern = pattern
+        self.post_type = post_type
+        self.sub_type = sub_type
+        self.event_name = event_name
+    
+    @classmethod
+    def from_config(cls, data: Dict[str, Any]) -> 'LogRule':
+        """
+        从配置创建日志规则
+        
+        Args:
+            data: 规则配置，包含 name、pattern、post_type、sub_type 和可选的 event_name
+        
+        Returns:
+            LogRule: 日志规则
+        
+        Raises:
+            ValueError: 规则格式错误、正则表达式无效或无法与其他规则合并编译
+        """
+        if not isinstance(data, dict):
+            raise ValueError('rule must be an object')
+        values = {}
+        for name in ('name', 'pattern', 'post_type', 'sub_type', 'event_name'):
+            value = data.get(name)
+            if value is None and name == 'event_name':
+                continue
+            if not isinstance(value, str) or not value:
+                raise ValueError(f'{name} must be a non-empty string')
+            values[name] = value
+        pattern = values['pattern']
+        if _NUMBERED_REFERENCE.search(pattern):
+            raise ValueError('numbered group references are not supported, use named groups')
+        if _GLOBAL_FLAGS.search(pattern):
+            raise ValueError('global inline flags are not supported, use scoped flags like (?i:...)')
+        # 按合并后的形式编译，确保不会影响其他规则
+        try:
+            re.compile(_wrap_pattern(0, pattern)[1])
+        except re.error as e:
+            raise ValueError(f'invalid pattern: {e}')
+        return cls(**values)
+
+
+class LogRuleMatch(NamedTuple):
+    """日志规则匹配结果"""
+    rule: LogRule
+    player: Optional[str]
+    message: Optional[str]
+
+
+class LogRuleEngine:
+    """日志规则引擎类"""
+    
+    def __init__(self, rules: Iterable[LogRule]):
+        """
+        合并编译日志规则
+        
+        每条规则包装为独立的命名组，规则内的命名组加上规则序号前缀避免重名，
+        匹配后由 lastgroup 确定命中的规则
+        
+        Args:
+            rules: 日志规则，按顺序优先匹配
+        
+        Raises:
+            ValueError: 规则无法合并编译
+        """
+        self.rules: List[LogRule] = list(rules)
+        # 分支名称 -> (规则, 原组名到合并后组名的映射)
+        self._branches: Dict[str, Tuple[LogRule, Dict[str, str]]] = {}
+        
+        branches = []
+        for index, rule in enumerate(self.rules):
+            branch, pattern, groups = _wrap_pattern(index, rule.pattern)
+            self._branches[branch] = (rule, groups)
+            branches.append(pattern)
+        
+        try:
+            self._pattern = re.compile('|'.join(branches)) if branches else None
+        except re.error as e:
+            raise ValueError(f'日志规则无法合并编译: {e}')
+    
+    def match(self, line: str) -> Optional[LogRuleMatch]:
+        """
+        匹配一行日志
+        
+        Args:
+            line: 日志内容
+        
+        Returns:
+            Optional[LogRuleMatch]: 匹配结果，没有规则命中时返回None
+        """
+        if self._pattern is None:
+            return None
+        
+        result = self._pattern.fullmatch(line)
+        if result is None:
+            return None
+        
+        rule, groups = self._branches[result.lastgroup]
+        player = groups.get('player')
+        message = groups.get('message')
+        return LogRuleMatch(
+            rule,
+            result.group(player) if player is not None else None,
+            result.group(message) if message is not None else None
+        )
+    
+    def __len__(self) -> int:
+        return len(self.rules)
+
+
+def load_log_rules(rule_configs: List[Dict[str, Any]], use_defaults: bool, logger) -> LogRuleEngine:
+    """
+    根据配置创建日志规则引擎
+    
+    配置中的规则排在内置规则之前，与内置规则同名时替换内置规则；无效的规则会被跳过
+    
+    Args:
+        rule_configs: 配置中的规则列表
+        use_defaults: 是否启用内置规则
+        logger: 日志记录器
+    
+    Returns:
+        LogRuleEngine: 日志规则引擎
+    """
+    rules: List[LogRule] = []
+    names = set()
+    for data in rule_configs or []:
+        try:
+            rule = LogRule.from_config(data)
+        except ValueError as e:
+            logger.warning(f'跳过无效的日志规则 {data}: {e}')
+            continue
+        rules.append(rule)
+        names.add(rule.name)
+    
+    if use_defaults:
+        rules.extend(LogRule.from_config(data) for data in DEFAULT_LOG_RULES if data['name'] not in names)
+    
+    try:
+        return LogRuleEngine(rules)
+    except ValueError as e:
+        logger.error(f'{e}，仅使用内置规则')
+        return LogRuleEngine(LogRule.from_config(data) for data in DEFAULT_LOG_RULES)
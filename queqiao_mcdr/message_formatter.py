@@ -6,13 +6,199 @@
 
 import json
 import re
-from typing import Dict, Any, List, Union, Optional
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Any, List, Union, Optional
 
 from mcdreforged.api.rtext import RText, RTextList, RColor, RStyle, RAction
 
+# 颜色名称映射表
+COLOR_MAP = {
+    'black': RColor.black,
+    'dark_blue': RColor.dark_blue,
+    'dark_green': RColor.dark_green,
+    'dark_aqua': RColor.dark_aqua,
+    'dark_red': RColor.dark_red,
+    'dark_purple': RColor.dark_purple,
+    'gold': RColor.gold,
+    'gray': RColor.gray,
+    'dark_gray': RColor.dark_gray,
+    'blue': RColor.blue,
+    'green': RColor.green,
+    'aqua': RColor.aqua,
+    'red': RColor.red,
+    'light_purple': RColor.light_purple,
+    'yellow': RColor.yellow,
+    'white': RColor.white,
+    
+    # 别名
+    'dark_grey': RColor.dark_gray,
+    'grey': RColor.gray,
+    'purple': RColor.light_purple,
+    'magenta': RColor.light_purple
+}
+
+# 点击动作名称映射表
+CLICK_ACTION_MAP = {
+    'open_url': RAction.open_url,
+    'run_command': RAction.run_command,
+    'suggest_command': RAction.suggest_command,
+    'copy_to_clipboard': RAction.copy_to_clipboard
+}
+
+# 原生Minecraft JSON组件允许的字段
+NATIVE_CONTENT_KEYS = frozenset(('text', 'translate', 'score', 'selector', 'keybind', 'nbt'))
+NATIVE_STYLE_KEYS = ('bold', 'italic', 'underlined', 'strikethrough', 'obfuscated')
+NATIVE_COMPONENT_KEYS = NATIVE_CONTENT_KEYS | frozenset(NATIVE_STYLE_KEYS) | frozenset((
+    'type', 'extra', 'with', 'fallback', 'separator', 'color', 'shadow_color', 'font', 'insertion',
+    'clickEvent', 'click_event', 'hoverEvent', 'hover_event',
+    'interpret', 'block', 'entity', 'storage', 'source',
+))
+NATIVE_COLORS = frozenset((
+    'black', 'dark_blue', 'dark_green', 'dark_aqua', 'dark_red', 'dark_purple', 'gold', 'gray',
+    'dark_gray', 'blue', 'green', 'aqua', 'red', 'light_purple', 'yellow', 'white', 'reset',
+))
+NATIVE_CLICK_ACTIONS = frozenset((
+    'open_url', 'open_file', 'run_command', 'suggest_command', 'change_page', 'copy_to_clipboard',
+))
+NATIVE_HOVER_ACTIONS = frozenset(('show_text', 'show_item', 'show_entity'))
+HEX_COLOR_PATTERN = re.compile(r'#[0-9a-fA-F]{6}')
+
+class MessageTooLargeError(ValueError):
+    """消息超出嵌套层数、组件数量或文本长度限制"""
+
+class MessageLimits:
+    """单条消息的大小限制检查类"""
+    
+    def __init__(self, max_depth: int, max_nodes: int, max_text_length: int):
+        """
+        初始化限制检查
+        
+        Args:
+            max_depth: 最大嵌套层数，为0时不限制
+            max_nodes: 最大组件数量，为0时不限制
+            max_text_length: 最大文本总长度，为0时不限制
+        """
+        self.max_depth = max_depth
+        self.max_nodes = max_nodes
+        self.max_text_length = max_text_length
+        self.nodes = 0
+        self.text_length = 0
+    
+    def visit(self, depth: int):
+        """
+        记录访问一个组件
+        
+        Args:
+            depth: 组件所在的嵌套层数
+        
+        Raises:
+            MessageTooLargeError: 超出嵌套层数或组件数量限制
+        """
+        if 0 < self.max_depth < depth:
+            raise MessageTooLargeError(f'Message nesting depth exceeds limit ({self.max_depth})')
+        self.nodes += 1
+        if 0 < self.max_nodes < self.nodes:
+            raise MessageTooLargeError(f'Message component count exceeds limit ({self.max_nodes})')
+    
+    def add_text(self, text: Any):
+        """
+        记录组件文本长度
+        
+        Args:
+            text: 文本内容
+        
+        Raises:
+            MessageTooLargeError: 超出文本总长度限制
+        """
+        if isinstance(text, str):
+            self.text_length += len(text)
+            if 0 < self.max_text_length < self.text_length:
+                raise MessageTooLargeError(f'Message text length exceeds limit ({self.max_text_length})')
+
+class MessageCache:
+    """消息编译结果LRU缓存类"""
+    
+    def __init__(self, max_size: int):
+        """
+        初始化缓存
+        
+        Args:
+            max_size: 最大缓存条目数，为0时禁用缓存
+        """
+        self.max_size = max_size
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        
+        # 统计计数
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, key: str) -> Optional[List[Any]]:
+        """获取缓存条目，不存在时返回None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+    
+    def put(self, key: str, entry: List[Any]):
+        """写入缓存条目，超出容量时淘汰最久未使用的条目"""
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+    
+    def resize(self, max_size: int):
+        """调整缓存容量"""
+        with self._lock:
+            self.max_size = max_size
+            while len(self._entries) > max(0, max_size):
+                self._entries.popitem(last=False)
+    
+    def get_stats(self) -> Dict[str, int]:
+        """获取缓存统计信息"""
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
 class MessageFormatter:
     """消息格式转换器类"""
     
+    # 编译结果缓存，条目为 [格式化结果, JSON文本, 是否为原生组件]，各项在首次使用时生成
+    cache = MessageCache(1024)
+    
+    # 单条消息的大小限制，为0时不限制
+    max_depth = 32
+    max_nodes = 2048
+    max_text_length = 32767
+    
+    @staticmethod
+    def configure(cache_size: int, max_depth: int = 32, max_nodes: int = 2048, max_text_length: int = 32767):
+        """
+        配置消息格式转换器
+        
+        Args:
+            cache_size: 编译结果缓存的最大条目数
+            max_depth: 最大嵌套层数
+            max_nodes: 最大组件数量
+            max_text_length: 最大文本总长度
+        """
+        MessageFormatter.cache.resize(cache_size)
+        MessageFormatter.max_depth = max_depth
+        MessageFormatter.max_nodes = max_nodes
+        MessageFormatter.max_text_length = max_text_length
+    
     @staticmethod
     def format_message(message) -> Union[str, RText, RTextList]:
         """
@@ -23,136 +209,421 @@ class MessageFormatter:
         
         Returns:
             Union[str, RText, RTextList]: 格式化后的消息
+        
+        
+        Raises:
+            MessageTooLargeError: 消息超出限制
         """
-        # 如果是字符串，直接返回
+        # 如果是字符串，检查长度后直接返回
         if isinstance(message, str):
+            MessageFormatter._check_limits(message)
             return message
         
+        entry = MessageFormatter._get_entry(message, MessageFormatter._ensure_compiled)
+        return entry[0]
+    
+    @staticmethod
+    def format_message_json(message) -> str:
+        """
+        将QueQiao消息格式转换为Minecraft JSON文本，用于 title 等命令
+        
+        已经是原生Minecraft JSON组件的消息直接输出，不经过RText转换
+        
+        Args:
+            message: QueQiao消息对象或字符串
+        
+        Returns:
+            str: JSON文本
+        
+        
+        Raises:
+            MessageTooLargeError: 消息超出限制
+        """
+        if isinstance(message, str):
+            MessageFormatter._check_limits(message)
+            return RText(message).to_json_str()
+        
+        entry = MessageFormatter._get_entry(message, MessageFormatter._ensure_json)
+        return entry[1]
+    
+    @staticmethod
+    def format_native_json(message) -> Optional[str]:
+        """
+        获取原生Minecraft JSON组件消息的JSON文本
+        
+        Args:
+            message: QueQiao消息对象或字符串
+        
+        Returns:
+            Optional[str]: 消息为原生组件时返回JSON文本，否则返回None
+        
+        
+        Raises:
+            MessageTooLargeError: 消息超出限制
+        """
+        if isinstance(message, str):
+            return None
+        
+        entry = MessageFormatter._get_entry(message, MessageFormatter._ensure_json)
+        return entry[1] if entry[2] else None
+    
+    @staticmethod
+    def is_native_component(message) -> bool:
+        """
+        检查消息是否为可以直接交给Minecraft的原生JSON组件
+        
+        Args:
+            message: 消息对象
+        
+        Returns:
+            bool: 是否为原生组件
+        
+        Raises:
+            MessageTooLargeError: 消息超出限制
+        """
+        if isinstance(message, str):
+            MessageFormatter._check_limits(message)
+            return True
+        if not isinstance(message, (dict, list)):
+            return False
+        
+        limits = MessageFormatter._new_limits()
+        # 栈元素为 (组件, 嵌套层数)，顶层列表的元素与顶层组件同级
+        stack = [(node, 1) for node in message] if isinstance(message, list) else [(message, 1)]
+        if not stack:
+            return False
+        while stack:
+            node, depth = stack.pop()
+            limits.visit(depth)
+            if isinstance(node, str):
+                limits.add_text(node)
+                continue
+            
+            if isinstance(node, list):
+                if not node:
+                    return False
+                stack.extend((item, depth + 1) for item in node)
+                continue
+            
+            if not isinstance(node, dict):
+                return False
+            # 旧版 {"type": ..., "data": ...} 包装格式需要转换
+            if 'data' in node and 'type' in node:
+                return False
+            if not NATIVE_COMPONENT_KEYS.issuperset(node.keys()):
+                return False
+            if not NATIVE_CONTENT_KEYS.intersection(node.keys()):
+                return False
+            if 'text' in node and not isinstance(node['text'], str):
+                return False
+            limits.add_text(node.get('text'))
+            color = node.get('color')
+            if color is not None and not (
+                isinstance(color, str) and (color in NATIVE_COLORS or HEX_COLOR_PATTERN.fullmatch(color))
+            ):
+                return False
+            for style in NATIVE_STYLE_KEYS:
+                if style in node and not isinstance(node[style], bool):
+                    return False
+            
+            extra = node.get('extra')
+            if extra is not None:
+                if not isinstance(extra, list) or not extra:
+                    return False
+                stack.extend((item, depth + 1) for item in extra)
+            
+            with_args = node.get('with')
+            if with_args is not None:
+                if not isinstance(with_args, list):
+                    return False
+                stack.extend((arg, depth + 1) for arg in with_args if not isinstance(arg, (int, float)))
+            
+            for key in ('clickEvent', 'click_event'):
+                click_event = node.get(key)
+                if click_event is not None and not (
+                    isinstance(click_event, dict) and click_event.get('action') in NATIVE_CLICK_ACTIONS
+                ):
+                    return False
+            
+            for key in ('hoverEvent', 'hover_event'):
+                hover_event = node.get(key)
+                if hover_event is None:
+                    continue
+                if not isinstance(hover_event, dict) or hover_event.get('action') not in NATIVE_HOVER_ACTIONS:
+                    return False
+                if hover_event['action'] == 'show_text':
+                    contents = hover_event.get('contents', hover_event.get('value'))
+                    if contents is None:
+                        return False
+                    stack.append((contents, depth + 1))
+        
+        return True
+    
+    @staticmethod
+    def _new_limits() -> MessageLimits:
+        """创建使用当前配置的限制检查"""
+        return MessageLimits(MessageFormatter.max_depth, MessageFormatter.max_nodes, MessageFormatter.max_text_length)
+    
+    @staticmethod
+    def _check_limits(message) -> None:
+        """
+        在生成缓存键和转换之前检查消息大小，超出限制的消息不会被完整序列化
+        
+        遍历顶层列表、extra、with、旧版包装格式的 data 和 show_text 悬浮文本中的组件，
+        超出嵌套层数、组件数量或文本总长度限制时立即中止
+        
+        Args:
+            message: 消息对象
+        
+        Raises:
+            MessageTooLargeError: 消息超出限制
+        """
+        limits = MessageFormatter._new_limits()
+        if isinstance(message, list):
+            # 顶层列表的每个元素都是一个组件，长度超出时无需遍历
+            if 0 < limits.max_nodes < len(message):
+                raise MessageTooLargeError(f'Message component count exceeds limit ({limits.max_nodes})')
+            stack = [(node, 1) for node in message]
+        else:
+            stack = [(message, 1)]
+        while stack:
+            node, depth = stack.pop()
+            limits.visit(depth)
+            if isinstance(node, list):
+                stack.extend((item, depth + 1) for item in node)
+                continue
+            if not isinstance(node, dict):
+                limits.add_text(node)
+                continue
+            
+            data = node.get('data') if 'type' in node and 'data' in node else node
+            if not isinstance(data, dict):
+                continue
+            limits.add_text(data.get('text'))
+            for key in ('extra', 'with'):
+                children = data.get(key)
+                if isinstance(children, list):
+                    stack.extend((item, depth + 1) for item in children)
+            
+            contents = MessageFormatter._get_hover_contents(data)
+            if isinstance(contents, list):
+                stack.extend((item, depth + 1) for item in contents)
+            elif isinstance(contents, dict):
+                stack.append((contents, depth + 1))
+            else:
+                limits.add_text(contents)
+    
+    @staticmethod
+    def _get_entry(message, fill: Callable[[List[Any], Any], None]) -> List[Any]:
+        """
+        获取消息的缓存条目并填充所需的结果
+        
+        先检查消息大小，通过后才生成缓存键；新条目在填充成功后才写入缓存，超出限制的消息不会占用缓存
+        
+        Args:
+            message: 消息对象
+            fill: 填充函数，接收缓存条目和消息对象
+        
+        Returns:
+            List[Any]: 缓存条目
+        
+        Raises:
+            MessageTooLargeError: 消息超出限制
+        """
+        MessageFormatter._check_limits(message)
+        try:
+            key = json.dumps(message, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+        except (TypeError, ValueError, RecursionError):
+            # 无法规范化的消息不进入缓存
+            key = None
+        
+        entry = MessageFormatter.cache.get(key) if key is not None else None
+        if entry is not None:
+            fill(entry, message)
+            return entry
+        
+        entry = [None, None, None]
+        fill(entry, message)
+        if key is not None:
+            MessageFormatter.cache.put(key, entry)
+        return entry
+    
+    @staticmethod
+    def _ensure_compiled(entry: List[Any], message) -> None:
+        """生成缓存条目的格式化结果"""
+        if entry[0] is None:
+            entry[0] = MessageFormatter._compile_message(message)
+    
+    @staticmethod
+    def _ensure_json(entry: List[Any], message) -> None:
+        """生成缓存条目的JSON文本，原生组件直接序列化"""
+        if entry[1] is not None:
+            return
+        
+        if MessageFormatter.is_native_component(message):
+            # 顶层列表中后续元素会继承第一个元素的样式，补充空的首元素以保持与RText转换一致
+            if isinstance(message, list) and message[0] != '':
+                message = [''] + message
+            entry[1] = json.dumps(message, ensure_ascii=False, separators=(',', ':'))
+            entry[2] = True
+            return
+        
+        MessageFormatter._ensure_compiled(entry, message)
+        formatted = entry[0]
+        entry[1] = formatted.to_json_str() if hasattr(formatted, 'to_json_str') else RText(str(formatted)).to_json_str()
+        entry[2] = False
+    
+    @staticmethod
+    def _compile_message(message) -> Union[str, RText, RTextList]:
+        """将非字符串消息转换为RText"""
         # 如果是列表，处理每个元素并连接
         if isinstance(message, list):
             result = RTextList()
-            for item in message:
-                MessageFormatter._append_component(result, MessageFormatter._format_component(item))
+            MessageFormatter._flatten_components(message, result)
             return result
         
         # 如果是字典，处理为组件
         if isinstance(message, dict):
-            return MessageFormatter._format_component(message)
+            result = RTextList()
+            MessageFormatter._flatten_components([message], result)
+            return result.children[0] if len(result.children) == 1 else result
         
         # 其他类型，转为字符串
         return str(message)
     
     @staticmethod
-    def _format_component(component: Dict[str, Any]) -> Union[RText, RTextList, str]:
+    def _flatten_components(components: List[Any], target: RTextList) -> None:
         """
-        格式化单个消息组件
+        将组件列表展开为扁平的RText序列并追加到目标列表
+        
+        使用显式栈一次遍历 extra 和悬浮文本，不产生递归和中间列表的重复复制，
+        超出嵌套层数、组件数量或文本总长度限制时立即中止
         
         Args:
-            component: 消息组件
+            components: 组件列表
+            target: 目标RTextList
         
-        Returns:
-            Union[RText, str]: 格式化后的组件
+        Raises:
+            MessageTooLargeError: 消息超出限制
         """
-        # 检查组件类型
-        if not isinstance(component, dict):
-            return str(component)
-
-        # 兼容两种格式：
-        # 1) 旧版 QueQiao: {"type": "text", "data": {...}}
-        # 2) Queqiao V2 / 原生 Minecraft JSON 组件: {"text": "...", "color": "...", ...}
-        is_wrapped_component = 'type' in component and 'data' in component
-        comp_type = component.get('type', 'text') if is_wrapped_component else 'text'
-        comp_data = component.get('data', {}) if is_wrapped_component else component
-        
-        # 处理文本组件
-        if comp_type == 'text':
-            text = comp_data.get('text', '')
-
-            # 创建RText对象
-            rtext = RText(text)
+        limits = MessageFormatter._new_limits()
+        # 栈元素为 (组件, 输出列表, 嵌套层数)，逆序入栈以保持输出顺序
+        stack = [(component, target, 1) for component in reversed(components)]
+        while stack:
+            component, output, depth = stack.pop()
+            limits.visit(depth)
             
-            # 设置颜色
-            color = comp_data.get('color')
-            if color:
-                try:
-                    rtext.set_color(MessageFormatter._parse_color(color))
-                except:
-                    pass
+            # 检查组件类型
+            if not isinstance(component, dict):
+                text = str(component)
+                limits.add_text(text)
+                output.append(text)
+                continue
             
-            # 设置样式
-            styles = []
-            if comp_data.get('bold'):
-                styles.append(RStyle.bold)
-            if comp_data.get('italic'):
-                styles.append(RStyle.italic)
-            if comp_data.get('underlined'):
-                styles.append(RStyle.underlined)
-            if comp_data.get('strikethrough'):
-                styles.append(RStyle.strikethrough)
-            if comp_data.get('obfuscated'):
-                styles.append(RStyle.obfuscated)
+            # 兼容两种格式：
+            # 1) 旧版 QueQiao: {"type": "text", "data": {...}}
+            # 2) Queqiao V2 / 原生 Minecraft JSON 组件: {"text": "...", "color": "...", ...}
+            is_wrapped_component = 'type' in component and 'data' in component
+            comp_type = component.get('type', 'text') if is_wrapped_component else 'text'
+            comp_data = component.get('data', {}) if is_wrapped_component else component
             
-            if styles:
-                rtext.set_styles(styles)
+            # 其他类型，转为字符串
+            if comp_type != 'text' or not isinstance(comp_data, dict):
+                text = str(component)
+                limits.add_text(text)
+                output.append(text)
+                continue
             
-            # 设置点击事件
-            click_event = comp_data.get('click_event') or comp_data.get('clickEvent')
-            if click_event and isinstance(click_event, dict):
-                action = click_event.get('action')
-                value = click_event.get('value')
-                if action and value is not None:
-                    rtext.set_click_event(MessageFormatter._parse_click_action(str(action)), str(value))
+            text = comp_data.get('text', '')
+            limits.add_text(text)
+            rtext = MessageFormatter._create_rtext(text, comp_data)
+            output.append(rtext)
+            
+            # 设置悬浮事件，悬浮文本中的组件在后续遍历中填充
+            hover_contents = MessageFormatter._get_hover_contents(comp_data)
+            if not hover_contents:
+                pass
+            elif isinstance(hover_contents, (list, dict)):
+                hover_text = RTextList()
+                rtext.set_hover_text(hover_text)
+                items = hover_contents if isinstance(hover_contents, list) else [hover_contents]
+                stack.extend((item, hover_text, depth + 1) for item in reversed(items))
+            elif hover_contents:
+                limits.add_text(str(hover_contents))
+                rtext.set_hover_text(str(hover_contents))
             
-            # 设置悬浮事件
-            hover_event = comp_data.get('hover_event') or comp_data.get('hoverEvent')
-            if hover_event and isinstance(hover_event, dict):
-                action = hover_event.get('action')
-                action = action.lower() if isinstance(action, str) else action
-                # v1 使用 value；v2 使用 contents（MessageBuilder 会规范化为 contents）
-                hover_contents = None
-                if 'contents' in hover_event:
-                    hover_contents = hover_event.get('contents')
-                elif 'value' in hover_event:
-                    hover_contents = hover_event.get('value')
-                elif 'text' in hover_event:
-                    hover_contents = hover_event.get('text')
-
-                if action == 'show_text' and hover_contents:
-                    if isinstance(hover_contents, list):
-                        hover_text = RTextList()
-                        for item in hover_contents:
-                            MessageFormatter._append_component(hover_text, MessageFormatter._format_component(item))
-                        rtext.set_hover_text(hover_text)
-                    elif isinstance(hover_contents, dict):
-                        rtext.set_hover_text(MessageFormatter._format_component(hover_contents))
-                    else:
-                        rtext.set_hover_text(str(hover_contents))
-
             # 处理原生组件的 extra 字段
             extra = comp_data.get('extra')
             if isinstance(extra, list) and extra:
-                result = RTextList()
-                MessageFormatter._append_component(result, rtext)
-                for item in extra:
-                    MessageFormatter._append_component(result, MessageFormatter._format_component(item))
-                return result
-
-            return rtext
-        
-        # 其他类型，转为字符串
-        return str(component)
-
+                stack.extend((item, output, depth + 1) for item in reversed(extra))
+    
     @staticmethod
-    def _append_component(target: RTextList, component: Union[RText, RTextList, str]) -> None:
-        """将组件安全追加到 RTextList，自动展开 RTextList"""
-        if isinstance(component, RTextList):
+    def _create_rtext(text: Any, comp_data: Dict[str, Any]) -> RText:
+        """
+        根据组件数据创建单个RText，不处理悬浮事件和子组件
+        
+        Args:
+            text: 文本内容
+            comp_data: 组件数据
+        
+        Returns:
+            RText: 创建的RText对象
+        """
+        # 创建RText对象
+        rtext = RText(text)
+        
+        # 设置颜色
+        color = comp_data.get('color')
+        if color:
             try:
-                for item in component:
-                    target.append(item)
-            except Exception:
-                target.append(component)
-            return
-        target.append(component)
+                rtext.set_color(MessageFormatter._parse_color(color))
+            except:
+                pass
+        
+        # 设置样式
+        styles = []
+        if comp_data.get('bold'):
+            styles.append(RStyle.bold)
+        if comp_data.get('italic'):
+            styles.append(RStyle.italic)
+        if comp_data.get('underlined'):
+            styles.append(RStyle.underlined)
+        if comp_data.get('strikethrough'):
+            styles.append(RStyle.strikethrough)
+        if comp_data.get('obfuscated'):
+            styles.append(RStyle.obfuscated)
+        
+        if styles:
+            rtext.set_styles(styles)
+        
+        # 设置点击事件
+        click_event = comp_data.get('click_event') or comp_data.get('clickEvent')
+        if click_event and isinstance(click_event, dict):
+            action = click_event.get('action')
+            value = click_event.get('value')
+            if action and value is not None:
+                rtext.set_click_event(MessageFormatter._parse_click_action(str(action)), str(value))
+        
+        return rtext
+    
+    @staticmethod
+    def _get_hover_contents(comp_data: Dict[str, Any]) -> Any:
+        """获取 show_text 悬浮事件的内容，没有时返回None"""
+        hover_event = comp_data.get('hover_event') or comp_data.get('hoverEvent')
+        if not hover_event or not isinstance(hover_event, dict):
+            return None
+        
+        action = hover_event.get('action')
+        action = action.lower() if isinstance(action, str) else action
+        if action != 'show_text':
+            return None
+        
+        # v1 使用 value；v2 使用 contents（MessageBuilder 会规范化为 contents）
+        if 'contents' in hover_event:
+            return hover_event.get('contents')
+        if 'value' in hover_event:
+            return hover_event.get('value')
+        return hover_event.get('text')
     
     @staticmethod
     def _parse_color(color_name: str) -> RColor:
@@ -165,32 +636,7 @@ class MessageFormatter:
         Returns:
             RColor: 对应的RColor
         """
-        color_map = {
-            'black': RColor.black,
-            'dark_blue': RColor.dark_blue,
-            'dark_green': RColor.dark_green,
-            'dark_aqua': RColor.dark_aqua,
-            'dark_red': RColor.dark_red,
-            'dark_purple': RColor.dark_purple,
-            'gold': RColor.gold,
-            'gray': RColor.gray,
-            'dark_gray': RColor.dark_gray,
-            'blue': RColor.blue,
-            'green': RColor.green,
-            'aqua': RColor.aqua,
-            'red': RColor.red,
-            'light_purple': RColor.light_purple,
-            'yellow': RColor.yellow,
-            'white': RColor.white,
-            
-            # 别名
-            'dark_grey': RColor.dark_gray,
-            'grey': RColor.gray,
-            'purple': RColor.light_purple,
-            'magenta': RColor.light_purple
-        }
-        
-        return color_map.get(color_name.lower(), RColor.white)
+        return COLOR_MAP.get(color_name.lower(), RColor.white)
     
     @staticmethod
     def _parse_click_action(action_name: str) -> RAction:
@@ -203,14 +649,7 @@ class MessageFormatter:
         Returns:
             RAction: 对应的RAction
         """
-        action_map = {
-            'open_url': RAction.open_url,
-            'run_command': RAction.run_command,
-            'suggest_command': RAction.suggest_command,
-            'copy_to_clipboard': RAction.copy_to_clipboard
-        }
-        
-        return action_map.get(action_name.lower(), RAction.suggest_command)
+        return CLICK_ACTION_MAP.get(action_name.lower(), RAction.suggest_command)
     
     @staticmethod
     def parse_message(message_str: str) -> Union[str, Dict[str, Any], List[Dict[str, Any]]]:
@@ -0,0 +1,123 @@
+"""
+玩家状态缓存模块
+
+缓存玩家的维度和坐标信息，合并对同一玩家的并发查询
+"""
+
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from queqiao_mcdr.response_builder import Coordinate
+
+# 位置信息: (dimension, coordinate)
+Location = Tuple[Optional[Any], Optional[Coordinate]]
+
+class PlayerStateCache:
+    """玩家状态缓存类"""
+    
+    def __init__(self, ttl: float):
+        """
+        初始化玩家状态缓存
+        
+        Args:
+            ttl: 缓存有效期（秒），为0时只合并并发查询不缓存结果
+        """
+        self.ttl = ttl
+        self._entries: Dict[str, Tuple[float, Location]] = {}
+        self._pending: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        
+        # 统计计数
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+    
+    def get_location(self, player_name: str, loader: Callable[[str], Future]) -> Future:
+        """
+        获取玩家位置信息
+        
+        缓存有效时直接返回结果；已有相同玩家的查询在进行中时共享该查询；
+        否则调用 loader 发起新的查询
+        
+        Args:
+            player_name: 玩家名称
+            loader: 查询函数，接收玩家名称并返回结果为位置信息的 Future
+        
+        Returns:
+            Future: 结果为 (dimension, coordinate) 元组
+        """
+        with self._lock:
+            entry = self._entries.get(player_name)
+            if entry is not None and time.monotonic() - entry[0] < self.ttl:
+                self.hits += 1
+                future: Future = Future()
+                future.set_result(entry[1])
+                return future
+            
+            pending = self._pending.get(player_name)
+            if pending is not None:
+                self.coalesced += 1
+                return pending
+            
+            self.misses += 1
+            future = Future()
+            self._pending[player_name] = future
+        
+        try:
+            load_future = loader(player_name)
+        except Exception as e:
+            with self._lock:
+                if self._pending.get(player_name) is future:
+                    del self._pending[player_name]
+            future.set_exception(e)
+            return future
+        
+        def on_loaded(done: Future):
+            exception = done.exception()
+            location = done.result() if exception is None else None
+            
+            with self._lock:
+                # 查询期间缓存被失效时不保存结果
+                if self._pending.get(player_name) is future:
+                    del self._pending[player_name]
+                    if location is not None and any(value is not None for value in location):
+                        self._entries[player_name] = (time.monotonic(), location)
+            
+            if future.cancelled():
+                return
+            if exception is not None:
+                future.set_exception(exception)
+            else:
+                future.set_result(location)
+        
+        load_future.add_done_callback(on_loaded)
+        return future
+    
+    def invalidate(self, player_name: str):
+        """
+        使指定玩家的缓存失效
+        
+        Args:
+            player_name: 玩家名称
+        """
+        with self._lock:
+            self._entries.pop(player_name, None)
+            self._pending.pop(player_name, None)
+    
+    def clear(self):
+        """清空所有缓存"""
+        with self._lock:
+            self._entries.clear()
+            self._pending.clear()
+    
+    def get_stats(self) -> Dict[str, int]:
+        """获取缓存统计信息"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+            }
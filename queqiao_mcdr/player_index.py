@@ -0,0 +1,195 @@
+"""
+在线玩家索引模块
+
+根据玩家加入/离开事件维护在线玩家列表，支持按名称和UUID快速查找，
+并在后台定期与服务器玩家列表进行校准
+"""
+
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+class PlayerIndex:
+    """在线玩家索引类"""
+    
+    def __init__(self, logger):
+        """
+        初始化在线玩家索引
+        
+        Args:
+            logger: 日志记录器
+        """
+        self.logger = logger
+        self._lock = threading.Lock()
+        self._uuid_by_name: Dict[str, str] = {}
+        self._name_by_uuid: Dict[str, str] = {}
+        self._version = 0
+        
+        # 最近一次校准得到的最大玩家数
+        self.max_players: Optional[int] = None
+        # 是否至少成功校准过一次
+        self.ready = False
+        
+        self._reconcile_thread: Optional[threading.Thread] = None
+        self._reconcile_wakeup = threading.Event()
+        self._stopped = threading.Event()
+    
+    def add(self, name: str, uuid: str = ''):
+        """
+        添加或更新在线玩家
+        
+        Args:
+            name: 玩家名称
+            uuid: 玩家UUID，未知时为空字符串
+        """
+        uuid = uuid.lower()
+        with self._lock:
+            old_uuid = self._uuid_by_name.get(name)
+            if uuid:
+                if old_uuid and old_uuid != uuid:
+                    self._name_by_uuid.pop(old_uuid, None)
+                self._uuid_by_name[name] = uuid
+                self._name_by_uuid[uuid] = name
+            elif old_uuid is None:
+                # UUID未知时保留玩家在线状态，等待后台校准补全
+                self._uuid_by_name[name] = ''
+            self._version += 1
+    
+    def remove(self, name: str):
+        """
+        移除离线玩家
+        
+        Args:
+            name: 玩家名称
+        """
+        with self._lock:
+            uuid = self._uuid_by_name.pop(name, None)
+            if uuid:
+                self._name_by_uuid.pop(uuid, None)
+            self._version += 1
+    
+    def clear(self):
+        """清空索引（服务器停止时调用）"""
+        with self._lock:
+            self._uuid_by_name.clear()
+            self._name_by_uuid.clear()
+            self._version += 1
+    
+    def find_by_uuid(self, uuid: str) -> Optional[str]:
+        """
+        根据UUID查找在线玩家名称
+        
+        Args:
+            uuid: 玩家UUID，不区分大小写
+        
+        Returns:
+            Optional[str]: 玩家名称，不在线时返回None
+        """
+        return self._name_by_uuid.get(str(uuid).lower())
+    
+    def get_uuid(self, name: str) -> Optional[str]:
+        """
+        获取在线玩家的UUID
+        
+        Args:
+            name: 玩家名称
+        
+        Returns:
+            Optional[str]: 玩家UUID（未知时为空字符串），不在线时返回None
+        """
+        return self._uuid_by_name.get(name)
+    
+    def is_online(self, name: str) -> bool:
+        """检查玩家是否在线"""
+        return name in self._uuid_by_name
+    
+    def has_unknown_uuid(self) -> bool:
+        """检查是否存在UUID未知的在线玩家"""
+        with self._lock:
+            return any(not uuid for uuid in self._uuid_by_name.values())
+    
+    def snapshot(self) -> List[Tuple[str, str]]:
+        """
+        获取在线玩家快照
+        
+        Returns:
+            List[Tuple[str, str]]: (玩家名称, UUID) 列表
+        """
+        with self._lock:
+            return list(self._uuid_by_name.items())
+    
+    def reconcile(self, player_list_result: Any, expected_version: Optional[int] = None) -> bool:
+        """
+        使用服务器玩家列表校准索引
+        
+        Args:
+            player_list_result: minecraft_data_api.get_server_player_list 的返回值
+            expected_version: 开始查询时的索引版本，查询期间索引发生变化时放弃本次校准
+        
+        Returns:
+            bool: 是否已应用校准结果
+        """
+        players = {}
+        for player in getattr(player_list_result, 'players', None) or []:
+            name = player.name if hasattr(player, 'name') else str(player)
+            players[name] = str(player.uuid).lower() if getattr(player, 'uuid', None) is not None else ''
+        
+        with self._lock:
+            if expected_version is not None and expected_version != self._version:
+                return False
+            self._uuid_by_name = players
+            self._name_by_uuid = {uuid: name for name, uuid in players.items() if uuid}
+            self._version += 1
+            self.max_players = getattr(player_list_result, 'limit', None)
+            self.ready = True
+        return True
+    
+    @property
+    def version(self) -> int:
+        """索引版本号，每次修改时递增"""
+        return self._version
+    
+    def start_reconcile(self, fetcher: Callable[[], Any], interval: float,
+                        condition: Optional[Callable[[], bool]] = None):
+        """
+        启动后台校准线程
+        
+        Args:
+            fetcher: 获取服务器玩家列表的函数
+            interval: 校准间隔（秒）
+            condition: 是否需要校准的检查函数，返回False时跳过本次校准，为None时总是校准
+        """
+        if self._reconcile_thread is not None:
+            return
+        
+        self._stopped.clear()
+        
+        def reconcile_loop():
+            while not self._stopped.is_set():
+                version = self.version
+                try:
+                    if condition is None or condition():
+                        result = fetcher()
+                        if result is not None:
+                            self.reconcile(result, expected_version=version)
+                except Exception as e:
+                    self.logger.debug(f'校准在线玩家索引失败: {e}')
+                
+                self._reconcile_wakeup.wait(interval)
+                self._reconcile_wakeup.clear()
+        
+        self._reconcile_thread = threading.Thread(
+            target=reconcile_loop,
+            daemon=True,
+            name='QueQiao-PlayerIndex'
+        )
+        self._reconcile_thread.start()
+    
+    def request_reconcile(self):
+        """请求尽快进行一次校准"""
+        self._reconcile_wakeup.set()
+    
+    def stop_reconcile(self):
+        """停止后台校准线程"""
+        self._stopped.set()
+        self._reconcile_wakeup.set()
+        self._reconcile_thread = None
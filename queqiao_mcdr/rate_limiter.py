@@ -0,0 +1,141 @@
+"""
+事件限流模块
+
+使用令牌桶分别限制单个玩家和全服的事件速率，
+刷屏或大量玩家同时死亡时超出速率的事件直接丢弃，不再创建事件和查询玩家信息
+"""
+
+import threading
+import time
+from typing import Dict, Optional
+
+
+class TokenBucket:
+    """令牌桶类"""
+    
+    __slots__ = ('rate', 'burst', 'tokens', 'updated')
+    
+    def __init__(self, rate: float, burst: float, now: float):
+        """
+        初始化令牌桶
+        
+        Args:
+            rate: 每秒补充的令牌数
+            burst: 令牌桶容量
+            now: 当前时间
+        """
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+    
+    def refill(self, now: float):
+        """按经过的时间补充令牌"""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def is_full(self, now: float) -> bool:
+        """令牌桶是否已补满（可以丢弃）"""
+        return self.tokens + (now - self.updated) * self.rate >= self.burst
+
+
+class EventRateLimiter:
+    """按玩家和全服限制事件速率的限流器类"""
+    
+    # 玩家令牌桶数量超过该值时清理已补满的令牌桶
+    PRUNE_THRESHOLD = 256
+    
+    def __init__(self, player_rate: float, player_burst: float, global_rate: float, global_burst: float):
+        """
+        初始化限流器
+        
+        Args:
+            player_rate: 单个玩家每秒允许的事件数，为0时不限制
+            player_burst: 单个玩家允许的突发事件数
+            global_rate: 全服每秒允许的事件数，为0时不限制
+            global_burst: 全服允许的突发事件数
+        """
+        self.player_rate = max(0.0, player_rate)
+        self.player_burst = max(1.0, player_burst)
+        self.global_rate = max(0.0, global_rate)
+        self.global_burst = max(1.0, global_burst)
+        
+        self._players: Dict[str, TokenBucket] = {}
+        self._global: Optional[TokenBucket] = None
+        self._lock = threading.Lock()
+        
+        # 统计计数
+        self.allowed = 0
+        self.dropped_player = 0
+        self.dropped_global = 0
+    
+    def try_acquire(self, player_name: Optional[str]) -> bool:
+        """
+        尝试为一个事件获取令牌
+        
+        玩家令牌不足时不消耗全服令牌，刷屏的玩家不会挤占其他玩家的配额
+        
+        Args:
+            player_name: 事件相关的玩家名称，为None时只检查全服速率
+        
+        Returns:
+            bool: 是否允许发送该事件
+        """
+        if self.player_rate <= 0 and self.global_rate <= 0:
+            self.allowed += 1
+            return True
+        
+        now = time.monotonic()
+        with self._lock:
+            bucket = None
+            if self.player_rate > 0 and player_name is not None:
+                bucket = self._players.get(player_name)
+                if bucket is None:
+                    if len(self._players) >= self.PRUNE_THRESHOLD:
+                        self._prune(now)
+                    bucket = self._players[player_name] = TokenBucket(self.player_rate, self.player_burst, now)
+                else:
+                    bucket.refill(now)
+                if bucket.tokens < 1:
+                    self.dropped_player += 1
+                    return False
+            
+            if self.global_rate > 0:
+                if self._global is None:
+                    self._global = TokenBucket(self.global_rate, self.global_burst, now)
+                else:
+                    self._global.refill(now)
+                if self._global.tokens < 1:
+                    self.dropped_global += 1
+                    return False
+                self._global.tokens -= 1
+            
+            if bucket is not None:
+                bucket.tokens -= 1
+            self.allowed += 1
+            return True
+    
+    def remove(self, player_name: str):
+        """移除玩家的令牌桶（玩家离开时调用）"""
+        with self._lock:
+            self._players.pop(player_name, None)
+    
+    def clear(self):
+        """清空所有令牌桶"""
+        with self._lock:
+            self._players.clear()
+            self._global = None
+    
+    def get_stats(self) -> Dict[str, int]:
+        """获取统计信息"""
+        return {
+            'allowed': self.allowed,
+            'dropped_player': self.dropped_player,
+            'dropped_global': self.dropped_global,
+            'dropped': self.dropped_player + self.dropped_global,
+        }
+    
+    def _prune(self, now: float):
+        """清理已补满的玩家令牌桶，与新建的令牌桶等价"""
+        for name in [name for name, bucket in self._players.items() if bucket.is_full(now)]:
+            del self._players[name]
@@ -6,6 +6,128 @@
 
 from typing import Dict, Any, Optional, List
 
+# Queqiao V2: 事件子类型到标准化事件名的映射
+EVENT_NAME_MAP = {
+    'chat': 'PlayerChatEvent',
+    'join': 'PlayerJoinEvent',
+    'quit': 'PlayerQuitEvent',
+    'death': 'PlayerDeathEvent',
+    'player_command': 'PlayerCommandEvent',
+    'achievent': 'PlayerAchievementEvent',
+    'location_update': 'PlayerLocationUpdateEvent',
+    'server_start': 'ServerStartEvent',
+    'server_stop': 'ServerStopEvent',
+    'whitelist_kick': 'PlayerWhitelistKickEvent',
+}
+
+
+class SlotModel:
+    """基于 __slots__ 的数据模型基类，按字段声明顺序序列化"""
+    
+    __slots__ = ()
+    
+    # 值为None时总是省略的字段（协议中的可选字段）
+    _optional_fields = frozenset()
+    
+    def to_dict(self, omit_none: bool = False) -> Dict[str, Any]:
+        """
+        序列化为字典
+        
+        Args:
+            omit_none: 是否省略值为None的字段
+        
+        Returns:
+            Dict[str, Any]: 序列化结果，嵌套的模型同样被序列化
+        """
+        result = {}
+        optional = self._optional_fields
+        for name in self.__slots__:
+            value = getattr(self, name)
+            if value is None:
+                if omit_none or name in optional:
+                    continue
+            elif isinstance(value, SlotModel):
+                value = value.to_dict(omit_none)
+            elif isinstance(value, list):
+                value = [item.to_dict(omit_none) if isinstance(item, SlotModel) else item for item in value]
+            result[name] = value
+        return result
+    
+    def __repr__(self) -> str:
+        fields = ', '.join(f'{name}={getattr(self, name)!r}' for name in self.__slots__)
+        return f'{type(self).__name__}({fields})'
+
+
+class Coordinate(SlotModel):
+    """坐标数据"""
+    
+    __slots__ = ('x', 'y', 'z')
+    
+    def __init__(self, x: Optional[float] = None, y: Optional[float] = None, z: Optional[float] = None):
+        self.x = x
+        self.y = y
+        self.z = z
+
+
+class Player(SlotModel):
+    """玩家数据"""
+    
+    __slots__ = ('nickname', 'uuid', 'is_op', 'dimension', 'coordinate', 'permission_level')
+    
+    def __init__(self, nickname: str, uuid: str = '', is_op: Optional[bool] = None,
+                 dimension: Optional[Any] = None, coordinate: Optional[Coordinate] = None,
+                 permission_level: int = 0):
+        self.nickname = nickname
+        self.uuid = uuid
+        self.is_op = is_op
+        self.dimension = dimension
+        self.coordinate = coordinate
+        self.permission_level = permission_level
+
+
+class PlayerList(SlotModel):
+    """玩家列表数据"""
+    
+    __slots__ = ('players', 'count', 'max_players')
+    
+    def __init__(self, players: List[Player], count: int, max_players: Optional[int] = None):
+        self.players = players
+        self.count = count
+        self.max_players = max_players
+
+
+class DeathInfo(SlotModel):
+    """死亡信息"""
+    
+    __slots__ = ('key', 'killer', 'item')
+    
+    def __init__(self, key: str, killer: Optional[str] = None, item: Optional[str] = None):
+        self.key = key
+        self.killer = killer
+        self.item = item
+
+
+class Event(SlotModel):
+    """事件数据"""
+    
+    __slots__ = ('server_name', 'server_version', 'server_type', 'post_type', 'sub_type', 'event_name',
+                 'player', 'message', 'death')
+    
+    _optional_fields = frozenset(('player', 'message', 'death'))
+    
+    def __init__(self, server_name: str, server_version: str, server_type: str, post_type: str,
+                 sub_type: Optional[str] = None, event_name: str = '', player: Optional[Player] = None,
+                 message: Optional[str] = None, death: Optional[DeathInfo] = None):
+        self.server_name = server_name
+        self.server_version = server_version
+        self.server_type = server_type
+        self.post_type = post_type
+        self.sub_type = sub_type
+        self.event_name = event_name
+        self.player = player
+        self.message = message
+        self.death = death
+
 
 class ResponseBuilder:
     """响应构建器类，提供统一的JSON响应格式"""
@@ -19,7 +141,7 @@ class ResponseBuilder:
             message: 成功消息
             echo: 回显标识
             data: 附加数据
-            
+        
         Returns:
             Dict[str, Any]: 成功响应对象
         """
@@ -40,7 +162,7 @@ class ResponseBuilder:
         Args:
             message: 错误消息
             echo: 回显标识
-            
+        
         Returns:
             Dict[str, Any]: 错误响应对象
         """
@@ -57,7 +179,7 @@ class ResponseBuilder:
         
         Args:
             message: 错误消息
-            
+        
         Returns:
             Dict[str, Any]: WebSocket错误响应对象
         """
@@ -74,7 +196,7 @@ class ResponseBuilder:
         Args:
             message: 回显消息
             original_data: 原始数据
-            
+        
         Returns:
             Dict[str, Any]: WebSocket回显响应对象
         """
@@ -98,30 +220,57 @@ class ResponseBuilder:
             server_type: 服务器类型
             post_type: 事件类型
             sub_type: 事件子类型
-            
+        
         Returns:
             Dict[str, Any]: 基础事件对象
         """
-        # Queqiao V2: 使用标准化的事件名
-        event_name_map = {
-            'chat': 'PlayerChatEvent',
-            'join': 'PlayerJoinEvent',
-            'quit': 'PlayerQuitEvent',
-            'death': 'PlayerDeathEvent',
-            'player_command': 'PlayerCommandEvent',
-            'achievent': 'PlayerAchievementEvent',
-        }
-        event_name = event_name_map.get(sub_type or '', '')
+        return ResponseBuilder.event_from_envelope(
+            ResponseBuilder.event_envelope(server_name, server_version, server_type),
+            post_type,
+            sub_type
+        ).to_dict()
+    
+    @staticmethod
+    def event_envelope(server_name: str, server_version: str, server_type: str) -> Dict[str, Any]:
+        """
+        创建事件中与服务器相关的固定部分，可在多个事件间复用
+        
+        Args:
+            server_name: 服务器名称
+            server_version: 服务器版本
+            server_type: 服务器类型
         
+        Returns:
+            Dict[str, Any]: 事件信封模板
+        """
         return {
             'server_name': server_name,
             'server_version': server_version,
-            'server_type': server_type,
-            'post_type': post_type,
-            'sub_type': sub_type,
-            'event_name': event_name
+            'server_type': server_type
         }
     
+    @staticmethod
+    def event_from_envelope(envelope: Dict[str, Any], post_type: str, sub_type: Optional[str] = None) -> Event:
+        """
+        基于事件信封模板创建基础事件结构
+        
+        Args:
+            envelope: 事件信封模板，不会被修改
+            post_type: 事件类型
+            sub_type: 事件子类型
+        
+        Returns:
+            Event: 基础事件对象
+        """
+        return Event(
+            envelope['server_name'],
+            envelope['server_version'],
+            envelope['server_type'],
+            post_type,
+            sub_type,
+            EVENT_NAME_MAP.get(sub_type or '', '')
+        )
+    
     @staticmethod
     def player_data(nickname: str, uuid: str = '', is_op: Optional[bool] = None, 
                     dimension: Optional[str] = None, coordinate: Optional[Dict] = None,
@@ -136,7 +285,7 @@ class ResponseBuilder:
             dimension: 所在维度
             coordinate: 坐标信息
             permission_level: 权限等级
-            
+        
         Returns:
             Dict[str, Any]: 玩家数据对象
         """
@@ -159,7 +308,7 @@ class ResponseBuilder:
             x: X坐标
             y: Y坐标
             z: Z坐标
-            
+        
         Returns:
             Dict[str, Any]: 坐标数据对象
         """
@@ -178,7 +327,7 @@ class ResponseBuilder:
             players: 玩家列表
             count: 玩家数量
             max_players: 最大玩家数
-            
+        
         Returns:
             Dict[str, Any]: 玩家列表数据对象
         """
@@ -0,0 +1,242 @@
+"""
+事件订阅模块
+
+维护每个客户端订阅的事件名称、事件子类型和玩家，
+并按事件名称建立索引，广播前即可确定需要接收事件的客户端
+"""
+
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Set
+from urllib.parse import parse_qs, urlsplit
+
+
+class Subscription:
+    """客户端事件订阅类，各项为None时表示不限制"""
+    
+    __slots__ = ('event_names', 'sub_types', 'players', 'location', 'batch')
+    
+    def __init__(self, event_names: Optional[Iterable[str]] = None, sub_types: Optional[Iterable[str]] = None,
+                 players: Optional[Iterable[str]] = None, location: bool = True, batch: bool = False):
+        """
+        初始化订阅
+        
+        Args:
+            event_names: 订阅的事件名称，如 PlayerChatEvent
+            sub_types: 订阅的事件子类型，如 chat
+            players: 订阅的玩家名称，不区分大小写
+            location: 是否需要事件中玩家的维度和坐标信息
+            batch: 是否接收合并了多个事件的批量数据帧
+        """
+        self.event_names: Optional[FrozenSet[str]] = frozenset(event_names) if event_names is not None else None
+        self.sub_types: Optional[FrozenSet[str]] = frozenset(sub_types) if sub_types is not None else None
+        self.players: Optional[FrozenSet[str]] = (
+            frozenset(player.lower() for player in players) if players is not None else None
+        )
+        self.location = location
+        self.batch = batch
+    
+    @classmethod
+    def from_query(cls, path: str) -> 'Subscription':
+        """
+        从握手请求路径的查询参数创建订阅
+        
+        支持 events、sub_types、players 三个参数，多个值使用逗号分隔或重复参数，
+        location=false 表示不需要位置信息，batch=true 表示接收批量事件
+        
+        Args:
+            path: 请求路径，可以包含查询字符串
+        
+        Returns:
+            Subscription: 订阅对象
+        """
+        query = parse_qs(urlsplit(path).query)
+        
+        def get_values(name: str) -> Optional[List[str]]:
+            if name not in query:
+                return None
+            return [item.strip() for value in query[name] for item in value.split(',') if item.strip()]
+        
+        def get_flag(name: str, default: bool) -> bool:
+            if name not in query:
+                return default
+            return query[name][-1].strip().lower() not in ('0', 'false', 'no', 'off')
+        
+        return cls(get_values('events'), get_values('sub_types'), get_values('players'),
+                   get_flag('location', True), get_flag('batch', False))
+    
+    @classmethod
+    def from_api_data(cls, data: Dict[str, Any]) -> 'Subscription':
+        """
+        从 subscribe API 的请求数据创建订阅
+        
+        Args:
+            data: 请求数据，events、sub_types、players 为字符串列表，缺失或为null时不限制；
+                location 为是否需要位置信息，默认为true；batch 为是否接收批量事件，默认为false
+        
+        Returns:
+            Subscription: 订阅对象
+        
+        Raises:
+            ValueError: 参数格式错误
+        """
+        values = []
+        for name in ('events', 'sub_types', 'players'):
+            value = data.get(name)
+            if value is not None and not (isinstance(value, list) and all(isinstance(item, str) for item in value)):
+                raise ValueError(f'{name} must be a list of strings')
+            values.append(value)
+        flags = {}
+        for name, default in (('location', True), ('batch', False)):
+            value = data.get(name, default)
+            if not isinstance(value, bool):
+                raise ValueError(f'{name} must be a boolean')
+            flags[name] = value
+        return cls(*values, **flags)
+    
+    def matches(self, sub_type: Optional[str], player_name: Optional[str]) -> bool:
+        """
+        检查事件子类型和玩家是否符合订阅（事件名称由索引筛选）
+        
+        Args:
+            sub_type: 事件子类型
+            player_name: 事件相关的玩家名称
+        
+        Returns:
+            bool: 是否符合订阅
+        """
+        if self.sub_types is not None and sub_type not in self.sub_types:
+            return False
+        if self.players is not None and (player_name is None or player_name.lower() not in self.players):
+            return False
+        return True
+    
+    def accepts(self, event_name: Optional[str], sub_type: Optional[str], player_name: Optional[str]) -> bool:
+        """
+        检查事件是否符合订阅（包括事件名称）
+        
+        Args:
+            event_name: 事件名称
+            sub_type: 事件子类型
+            player_name: 事件相关的玩家名称
+        
+        Returns:
+            bool: 是否符合订阅
+        """
+        if self.event_names is not None and event_name not in self.event_names:
+            return False
+        return self.matches(sub_type, player_name)
+    
+    def to_dict(self) -> Dict[str, Optional[List[str]]]:
+        """序列化为字典，用于API响应"""
+        return {
+            'events': sorted(self.event_names) if self.event_names is not None else None,
+            'sub_types': sorted(self.sub_types) if self.sub_types is not None else None,
+            'players': sorted(self.players) if self.players is not None else None,
+            'location': self.location,
+            'batch': self.batch,
+        }
+
+
+class SubscriptionIndex:
+    """按事件名称索引的订阅表类"""
+    
+    def __init__(self):
+        """初始化订阅表"""
+        self._subscriptions: Dict[Any, Subscription] = {}
+        # 订阅了全部事件名称的客户端
+        self._wildcard: Set[Any] = set()
+        # 事件名称 -> 订阅了该事件的客户端
+        self._by_event_name: Dict[str, Set[Any]] = {}
+        # 需要位置信息的客户端
+        self._location_clients: Set[Any] = set()
+    
+    def update(self, client: Any, subscription: Subscription):
+        """
+        设置客户端的订阅，替换之前的订阅
+        
+        Args:
+            client: 客户端会话
+            subscription: 订阅对象
+        """
+        self.remove(client)
+        self._subscriptions[client] = subscription
+        if subscription.location:
+            self._location_clients.add(client)
+        if subscription.event_names is None:
+            self._wildcard.add(client)
+        else:
+            for event_name in subscription.event_names:
+                self._by_event_name.setdefault(event_name, set()).add(client)
+    
+    def remove(self, client: Any):
+        """
+        移除客户端的订阅
+        
+        Args:
+            client: 客户端会话
+        """
+        subscription = self._subscriptions.pop(client, None)
+        if subscription is None:
+            return
+        self._location_clients.discard(client)
+        if subscription.event_names is None:
+            self._wildcard.discard(client)
+            return
+        for event_name in subscription.event_names:
+            clients = self._by_event_name.get(event_name)
+            if clients is not None:
+                clients.discard(client)
+                if not clients:
+                    del self._by_event_name[event_name]
+    
+    def get(self, client: Any) -> Optional[Subscription]:
+        """获取客户端的订阅"""
+        return self._subscriptions.get(client)
+    
+    def select(self, event_name: Optional[str], sub_type: Optional[str], player_name: Optional[str],
+               location_only: bool = False) -> List[Any]:
+        """
+        获取需要接收事件的客户端
+        
+        Args:
+            event_name: 事件名称
+            sub_type: 事件子类型
+            player_name: 事件相关的玩家名称
+            location_only: 是否只选择需要位置信息的客户端
+        
+        Returns:
+            List[Any]: 客户端会话列表
+        """
+        named = self._by_event_name.get(event_name) if event_name else None
+        if not self._wildcard and not named:
+            return []
+        
+        selected = []
+        for candidates in (self._wildcard, named or ()):
+            for client in candidates:
+                subscription = self._subscriptions[client]
+                if location_only and not subscription.location:
+                    continue
+                if subscription.matches(sub_type, player_name):
+                    selected.append(client)
+        return selected
+    
+    def has_subscribers(self, event_name: Optional[str] = None) -> bool:
+        """
+        检查是否有客户端可能接收该事件
+        
+        Args:
+            event_name: 事件名称，为None时检查是否有任何客户端
+        
+        Returns:
+            bool: 是否有客户端订阅
+        """
+        if event_name is None:
+            return bool(self._subscriptions)
+        return bool(self._wildcard) or bool(self._by_event_name.get(event_name))
+    
+    def has_location_subscribers(self) -> bool:
+        """是否有客户端需要位置信息"""
+        return bool(self._location_clients)
+    
+    def __len__(self) -> int:
+        return len(self._subscriptions)
@@ -9,6 +9,14 @@ import json
 import uuid
 from typing import Dict, Any, Optional
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# 当前使用的JSON序列化后端: json / orjson
+_json_backend = 'orjson' if orjson is not None else 'json'
+
 def get_server_version(server=None) -> str:
     """
     获取服务器版本
@@ -62,6 +70,41 @@ def safe_json_dumps(obj: Any) -> str:
     except:
         return "{}"
 
+def set_json_backend(backend: str) -> str:
+    """
+    设置JSON序列化后端
+    
+    Args:
+        backend: auto / json / orjson，orjson未安装时回退到json
+    
+    Returns:
+        str: 实际使用的后端名称
+    """
+    global _json_backend
+    if backend in ('auto', 'orjson') and orjson is not None:
+        _json_backend = 'orjson'
+    else:
+        _json_backend = 'json'
+    return _json_backend
+
+def json_dumps_bytes(obj: Any) -> bytes:
+    """
+    将对象序列化为UTF-8编码的JSON字节串
+    
+    Args:
+        obj: 要序列化的对象
+    
+    Returns:
+        bytes: JSON字节串
+    """
+    if _json_backend == 'orjson':
+        try:
+            return orjson.dumps(obj)
+        except TypeError:
+            # orjson不支持的类型（如非字符串键），回退到标准库
+            pass
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
 def safe_json_loads(json_str: str) -> Any:
     """
     安全地解析JSON字符串
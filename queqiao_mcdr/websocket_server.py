@@ -5,14 +5,22 @@ WebSocket服务器模块
 """
 
 import asyncio
-import json
+import time
 import websockets
-from typing import Dict, Any, Set, Optional
+from functools import partial
+from typing import Dict, Any, Set, Optional, List, Union
 
 from mcdreforged.api.all import *
 
 from queqiao_mcdr.config import Config
-from queqiao_mcdr.response_builder import ResponseBuilder
+from queqiao_mcdr.client_session import ClientSession
+from queqiao_mcdr.codec import Codec, get_available_codecs, select_codec
+from queqiao_mcdr.compression import create_extension_factories
+from queqiao_mcdr.event_batcher import EventBatcher
+from queqiao_mcdr.event_journal import parse_last_seq
+from queqiao_mcdr.response_builder import EVENT_NAME_MAP, ResponseBuilder, SlotModel
+from queqiao_mcdr.subscription import Subscription, SubscriptionIndex
+from queqiao_mcdr.utils import set_json_backend
 
 class WebSocketServer:
     """WebSocket服务器类"""
@@ -28,9 +36,30 @@ class WebSocketServer:
         self.config = config
         
         self.ws_server = None
-        self.clients: Set[websockets.WebSocketServerProtocol] = set()
+        self.json_backend = set_json_backend(config.json_backend)
+        # 可通过子协议协商的消息编码，未协商时使用JSON
+        self.codecs: Dict[str, Codec] = get_available_codecs(config)
+        # 每个连接对应一个拥有独立发送队列的客户端会话
+        self.clients: Dict[websockets.WebSocketServerProtocol, ClientSession] = {}
         self.authenticated_clients: Set[websockets.WebSocketServerProtocol] = set()
+        # 客户端事件订阅表，广播时据此筛选接收事件的客户端
+        self.subscriptions = SubscriptionIndex()
+        # 开启批量接收的客户端的事件在时间窗口内合并发送，时间窗口为0时不合并
+        self.event_batcher = EventBatcher(
+            config.event_batch_window_ms / 1000,
+            config.event_batch_max_events,
+            self.logger
+        )
+        # 事件日志（由API处理器持有），客户端断开后的一段时间内继续记录事件
+        self.journal = api_handler.event_journal
+        self.journal_hold = config.journal_hold_seconds
+        self._last_disconnect: Optional[float] = None
         self._running = False
+        
+        # 服务器所在的事件循环及事件分发队列（由 start 在 QueQiao-WebSocket 线程中创建）
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._event_queue: Optional[asyncio.Queue] = None
+        self._dispatcher_task: Optional[asyncio.Task] = None
     
     async def start(self):
         """启动WebSocket服务器"""
@@ -39,13 +68,20 @@ class WebSocketServer:
             return
         
         try:
-            # 使用自定义的连接处理器来处理认证
+            # 使用自定义的连接处理器来处理认证，压缩扩展按配置协商
             self.ws_server = await websockets.serve(
                 self.handle_client, 
                 self.host, 
                 self.port,
-                process_request=self.process_request
+                process_request=self.process_request,
+                subprotocols=list(self.codecs),
+                select_subprotocol=self._select_subprotocol,
+                compression=None,
+                extensions=create_extension_factories(self.config)
             )
+            self.loop = asyncio.get_running_loop()
+            self._event_queue = asyncio.Queue()
+            self._dispatcher_task = self.loop.create_task(self._event_dispatcher())
             self._running = True
             self.logger.info(f'WebSocket服务器已启动: ws://{self.host}:{self.port}{self.path}')
         except Exception as e:
@@ -64,6 +100,19 @@ class WebSocketServer:
         try:
             self._running = False
             
+            # 停止事件分发任务
+            if self._dispatcher_task is not None:
+                self._dispatcher_task.cancel()
+                try:
+                    await self._dispatcher_task
+                except asyncio.CancelledError:
+                    pass
+                self._dispatcher_task = None
+            self.event_batcher.clear()
+            
+            # 发送缓冲中的游戏命令
+            self.api_handler.command_batcher.flush()
+            
             # 关闭所有客户端
             if self.clients:
                 self.logger.debug(f'正在关闭 {len(self.clients)} 个客户端连接...')
@@ -71,6 +120,10 @@ class WebSocketServer:
                     *[self._close_client_safe(client) for client in list(self.clients)],
                     return_exceptions=True
                 )
+                await asyncio.gather(
+                    *[session.close() for session in list(self.clients.values())],
+                    return_exceptions=True
+                )
                 self.clients.clear()
                 self.authenticated_clients.clear()
                 self.logger.debug('所有客户端连接已关闭')
@@ -105,6 +158,8 @@ class WebSocketServer:
         """强制清理资源"""
         self._running = False
         self.ws_server = None
+        self._dispatcher_task = None
+        self._event_queue = None
         self.clients.clear()
         self.authenticated_clients.clear()
     
@@ -112,12 +167,38 @@ class WebSocketServer:
         """检查WebSocket服务器是否正在运行"""
         return self._running
     
+    def has_listeners(self, event_name: Optional[str] = None) -> bool:
+        """
+        检查是否有已连接的客户端订阅了该事件，可以在任意线程中调用
+        
+        启用事件日志时，客户端断开后 hold_seconds 内视为有客户端接收，以便重连后补发事件
+        
+        Args:
+            event_name: 事件名称，为None时检查是否有任何已连接的客户端
+        
+        Returns:
+            bool: 是否有客户端接收该事件
+        """
+        if not self._running:
+            return False
+        if self.subscriptions.has_subscribers(event_name):
+            return True
+        last_disconnect = self._last_disconnect
+        return (
+            self.journal is not None and last_disconnect is not None
+            and time.monotonic() - last_disconnect < self.journal_hold
+        )
+    
+    def wants_location(self) -> bool:
+        """是否有已连接的客户端需要事件中的位置信息，可以在任意线程中调用"""
+        return self._running and self.subscriptions.has_location_subscribers()
+    
     async def process_request(self, connection, request):
         """处理WebSocket连接请求，在握手阶段进行认证"""
         client_info = f'{connection.remote_address[0]}:{connection.remote_address[1]}'
         
-        # 检查路径
-        if request.path != self.path:
+        # 检查路径（查询参数用于事件订阅）
+        if request.path.split('?', 1)[0] != self.path:
             self.logger.warning(f'客户端路径不匹配，期望: {self.path}, 实际: {request.path}')
             return connection.respond(
                 status=400,
@@ -163,36 +244,191 @@ class WebSocketServer:
                 body=b'Invalid access token'
             )
     
-    async def broadcast_event(self, event_data: Dict[str, Any]):
-        """广播事件给所有已认证的客户端"""
-        if not self.authenticated_clients:
-            return
+    def _select_subprotocol(self, connection, subprotocols) -> Optional[str]:
+        """按服务器优先级选择子协议，客户端未请求子协议或请求的子协议均不支持时使用默认的JSON编码"""
+        for subprotocol in self.codecs:
+            if subprotocol in subprotocols:
+                return subprotocol
+        return None
+    
+    def dispatch_event(self, event_data: Union[SlotModel, Dict[str, Any]]) -> bool:
+        """
+        线程安全地投递事件，由服务器事件循环负责广播
         
+        可以在任意线程中调用，每个事件只进行一次入队操作，不会创建新的线程或事件循环
+        
+        Args:
+            event_data: 事件数据
+        
+        Returns:
+            bool: 是否成功投递
+        """
+        loop = self.loop
+        queue = self._event_queue
+        if not self._running or loop is None or queue is None or loop.is_closed():
+            return False
+        
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, event_data)
+            return True
+        except RuntimeError:
+            # 事件循环已关闭
+            return False
+    
+    async def _event_dispatcher(self):
+        """事件分发任务，依次广播队列中的事件"""
+        while True:
+            event_data = await self._event_queue.get()
+            try:
+                await self.broadcast_event(event_data)
+            except Exception as e:
+                self.logger.error(f'分发事件失败: {e}')
+    
+    async def broadcast_event(self, event_data: Union[SlotModel, Dict[str, Any]]):
+        """记录事件并广播给订阅了该事件的客户端（写入各客户端的发送队列）"""
         try:
-            message = json.dumps(event_data)
-            await asyncio.gather(
-                *[client.send(message) for client in self.authenticated_clients], 
-                return_exceptions=True
+            if self.journal is not None:
+                if isinstance(event_data, SlotModel):
+                    event_data = event_data.to_dict(self.config.omit_null_fields)
+                self.journal.append(event_data)
+            
+            if not self.authenticated_clients:
+                return
+            
+            # 先按订阅筛选客户端，没有客户端需要时不进行序列化；位置更新事件只发送给需要位置信息的客户端
+            event_name, sub_type, player_name = self._get_event_keys(event_data)
+            sessions = self.subscriptions.select(
+                event_name, sub_type, player_name,
+                location_only=event_name == EVENT_NAME_MAP['location_update']
             )
+            if not sessions:
+                return
+            
+            if isinstance(event_data, SlotModel):
+                event_data = event_data.to_dict(self.config.omit_null_fields)
+            # 每种编码只序列化一次，使用相同编码的客户端共享同一个已编码的数据帧
+            frames: Dict[Codec, bytes] = {}
+            batch_sessions = []
+            for session in sessions:
+                if self.event_batcher.window > 0 and session.subscription.batch:
+                    batch_sessions.append(session)
+                    continue
+                frame = frames.get(session.codec)
+                if frame is None:
+                    frame = frames[session.codec] = session.codec.encode(event_data)
+                session.enqueue(frame)
+            if batch_sessions:
+                self.event_batcher.add(event_data, batch_sessions)
             
             self.logger.debug(f'广播事件: {event_data}')
         except Exception as e:
             self.logger.error(f'广播事件失败: {e}')
     
+    async def _read_replay_events(self, last_seq: int, limit: int) -> List[Dict[str, Any]]:
+        """
+        读取需要补发的事件
+        
+        早于内存缓冲区的事件需要从事件历史中读取和解析，在线程池中执行避免阻塞其他客户端；
+        读取期间新记录的事件从内存缓冲区中补齐，因此调用后需要在同一次调度中完成订阅
+        
+        Args:
+            last_seq: 客户端收到的最后一个事件的序号
+            limit: 最多读取的事件数
+        
+        Returns:
+            List[Dict[str, Any]]: 按序号排列的事件
+        """
+        known_seq = self.journal.last_seq
+        loop = asyncio.get_running_loop()
+        events = await loop.run_in_executor(None, partial(self.journal.since, last_seq, limit))
+        newer_than = events[-1]['seq'] if events else min(last_seq, known_seq)
+        events.extend(self.journal.since(newer_than, limit=limit))
+        return events[-limit:]
+    
+    def _replay_events(self, session: ClientSession, events: List[Dict[str, Any]], last_seq: int):
+        """
+        将符合订阅的补发事件写入客户端的发送队列
+        
+        Args:
+            session: 客户端会话
+            events: 事件日志中序号大于 last_seq 的事件
+            last_seq: 客户端收到的最后一个事件的序号
+        """
+        subscription = session.subscription
+        replay = []
+        for event_data in events:
+            event_name, sub_type, player_name = self._get_event_keys(event_data)
+            if event_name == EVENT_NAME_MAP['location_update'] and not subscription.location:
+                continue
+            if subscription.accepts(event_name, sub_type, player_name):
+                replay.append(event_data)
+        # 不超过发送队列长度，避免补发的事件触发溢出策略
+        events = replay[-session.max_queue_size:]
+        
+        if self.event_batcher.window > 0 and subscription.batch:
+            step = self.event_batcher.max_events
+            for start in range(0, len(events), step):
+                session.enqueue(session.codec.encode({'post_type': 'batch', 'events': events[start:start + step]}))
+        else:
+            for event_data in events:
+                session.enqueue(session.codec.encode(event_data))
+        self.logger.info(f'已向客户端 {session.client_info} 补发 {len(events)} 个事件（last_seq={last_seq}）')
+    
+    @staticmethod
+    def _get_event_keys(event_data: Union[SlotModel, Dict[str, Any]]):
+        """获取用于订阅筛选的事件名称、子类型和玩家名称"""
+        if isinstance(event_data, dict):
+            player = event_data.get('player')
+            return (
+                event_data.get('event_name'),
+                event_data.get('sub_type'),
+                player.get('nickname') if isinstance(player, dict) else None
+            )
+        player = getattr(event_data, 'player', None)
+        return (
+            getattr(event_data, 'event_name', None),
+            getattr(event_data, 'sub_type', None),
+            player.nickname if player is not None else None
+        )
+    
+    def get_client_stats(self) -> List[Dict[str, Any]]:
+        """获取所有客户端会话的统计信息"""
+        return [session.get_stats() for session in list(self.clients.values())]
+    
     async def handle_client(self, websocket):
         """处理WebSocket客户端连接"""
         client_info = f'{websocket.remote_address[0]}:{websocket.remote_address[1]}'
         
         # 添加客户端到列表（认证已在握手阶段完成）
-        self.clients.add(websocket)
+        codec = select_codec(self.codecs, websocket.subprotocol)
+        session = ClientSession(websocket, self.config, self.logger, codec, self.subscriptions)
+        # 补发断线期间错过的事件，读取完成后与订阅在同一次调度中写入队列，之后的实时事件不会排在补发的事件之前
+        last_seq = parse_last_seq(websocket.request.path)
+        replay_events = None
+        if last_seq is not None and self.journal is not None:
+            replay_events = await self._read_replay_events(last_seq, session.max_queue_size)
+        session.subscribe(Subscription.from_query(websocket.request.path))
+        if replay_events is not None:
+            self._replay_events(session, replay_events, last_seq)
+        session.start()
+        self.clients[websocket] = session
         self.authenticated_clients.add(websocket)
-        self.logger.info(f'客户端已连接并认证: {client_info}，当前连接数: {len(self.clients)}')
+        # 没有客户端时跳过了在线玩家索引校准，客户端连接后尽快补全UUID
+        player_index = self.api_handler.player_index
+        if not player_index.ready or player_index.has_unknown_uuid():
+            player_index.request_reconcile()
+        self.logger.info(f'客户端已连接并认证: {client_info}（{codec.name}），当前连接数: {len(self.clients)}')
         
         try:
             # 开始处理消息
             async for message in websocket:
-                await self.process_message(websocket, message)
-                
+                if session.max_concurrent_requests <= 1:
+                    await self.process_message(session, message)
+                else:
+                    # 并发处理，达到并发上限时暂停读取新的请求
+                    await session.request_slots.acquire()
+                    self._dispatch_request(session, message)
+        
         except websockets.exceptions.ConnectionClosed:
             self.logger.info(f'客户端连接已关闭: {client_info}')
         except websockets.exceptions.ConnectionClosedError:
@@ -201,57 +437,102 @@ class WebSocketServer:
             self.logger.error(f'处理客户端连接时出错: {e}')
         finally:
             # 清理客户端
-            if websocket in self.clients:
-                self.clients.remove(websocket)
+            await session.close()
+            self._last_disconnect = time.monotonic()
+            self.clients.pop(websocket, None)
             if websocket in self.authenticated_clients:
                 self.authenticated_clients.remove(websocket)
+            if session.dropped_frames:
+                self.logger.info(f'客户端 {client_info} 共丢弃 {session.dropped_frames} 个数据帧')
             self.logger.info(f'客户端已断开: {client_info}，当前连接数: {len(self.clients)}，已认证连接数: {len(self.authenticated_clients)}')
     
-
     
-    async def process_message(self, websocket, message):
+    
+    async def process_message(self, session: ClientSession, message):
         """处理接收到的消息"""
+        response = await self._build_response(session, message)
+        await self._send_response(session, response)
+    
+    async def _build_response(self, session: ClientSession, message) -> Dict[str, Any]:
+        """解析消息并生成响应"""
+        codec = session.codec
+        try:
+            data = codec.decode(message)
+        except Exception:
+            self.logger.warning(f'收到无效的{codec.name}消息: {message!r}')
+            return ResponseBuilder.websocket_error(message=f'无效的{codec.name}格式，请发送有效的{codec.name}消息')
+        
         try:
-            data = json.loads(message)
-            
             self.logger.debug(f'收到消息: {data}')
             
             # 路由消息到处理器
-            response = await self._route_message(data)
-            await websocket.send(json.dumps(response))
-                
-        except json.JSONDecodeError:
-            self.logger.warning(f'收到无效的JSON消息: {message}')
-            await self._send_error_response(websocket, '无效的JSON格式，请发送有效的JSON消息')
+            return await self._route_message(session, data)
+        
         except Exception as e:
             self.logger.error(f'处理消息时出错: {e}')
-            await self._send_error_response(websocket, f'消息处理错误: {str(e)}')
+            return ResponseBuilder.websocket_error(message=f'消息处理错误: {str(e)}')
     
-    async def _route_message(self, data: Dict[str, Any]) -> Dict[str, Any]:
+    async def _send_response(self, session: ClientSession, response: Dict[str, Any]):
+        """使用客户端协商的编码发送响应"""
+        try:
+            codec = session.codec
+            await session.websocket.send(codec.encode(response), text=not codec.binary)
+        except websockets.exceptions.ConnectionClosed as e:
+            self.logger.debug(f'发送响应失败，连接已关闭: {e}')
+        except Exception as e:
+            self.logger.warning(f'发送响应失败: {e}')
+    
+    def _dispatch_request(self, session: ClientSession, message):
+        """
+        创建并发处理请求的任务
+        
+        调用前需要先获取 session.request_slots，任务结束时释放
+        """
+        loop = asyncio.get_running_loop()
+        
+        # 保持响应顺序时，每个请求需等待上一个请求的响应发送完成
+        previous_sent = session.last_response_sent if self.config.preserve_response_order else None
+        response_sent = loop.create_future() if self.config.preserve_response_order else None
+        session.last_response_sent = response_sent
+        
+        task = loop.create_task(self._process_request(session, message, previous_sent, response_sent))
+        session.request_tasks.add(task)
+        task.add_done_callback(session.request_tasks.discard)
+    
+    async def _process_request(self, session: ClientSession, message,
+                               previous_sent: Optional[asyncio.Future], response_sent: Optional[asyncio.Future]):
+        """并发模式下处理单个请求"""
+        try:
+            response = await self._build_response(session, message)
+            if previous_sent is not None:
+                await previous_sent
+            await self._send_response(session, response)
+        finally:
+            if response_sent is not None and not response_sent.done():
+                response_sent.set_result(None)
+            session.request_slots.release()
+    
+    async def _route_message(self, session: ClientSession, data: Dict[str, Any]) -> Dict[str, Any]:
         """路由消息到相应的处理器"""
+        # JSON数组视为批量API请求
+        if isinstance(data, list):
+            return await self.api_handler.handle_api_request('batch', data, session=session)
         if 'api' in data:
-            return await self._handle_api_request(data)
+            return await self._handle_api_request(session, data)
         else:
             return self._handle_echo(data)
     
-
     
-    async def _handle_api_request(self, data: Dict[str, Any]) -> Dict[str, Any]:
+    
+    async def _handle_api_request(self, session: ClientSession, data: Dict[str, Any]) -> Dict[str, Any]:
         """处理API请求"""
         api_name = data['api']
         api_data = data.get('data', {})
         echo = data.get('echo')
         
-        return await self.api_handler.handle_api_request(api_name, api_data, echo)
+        return await self.api_handler.handle_api_request(api_name, api_data, echo, session)
     
     def _handle_echo(self, data: Dict[str, Any]) -> Dict[str, Any]:
         """处理回显消息"""
         return ResponseBuilder.websocket_echo(message='收到你的消息', original_data=data)
-    
-    async def _send_error_response(self, websocket, error_message: str):
-        """发送错误响应"""
-        try:
-            error_response = ResponseBuilder.websocket_error(message=error_message)
-            await websocket.send(json.dumps(error_response))
-        except:
-            pass  # 如果发送失败，忽略错误
+